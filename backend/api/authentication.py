@@ -0,0 +1,132 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import bump_generation, get_generations
+
+
+def hash_token(key):
+    """Ключ кеша для токена: сам токен в кеш не попадает."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token_namespace(token_hash):
+    return f'token:{token_hash}'
+
+
+class TokenCache:
+    """LRU токенов процесса с TTL и версией в кеше Django.
+
+    Токен хранится в памяти процесса не дольше TOKEN_CACHE_LOCAL_TIMEOUT
+    и после этого заново проверяется в базе, так что неактивный или
+    удаленный пользователь теряет доступ не позже, чем через этот
+    срок, даже если кеш Django у каждого процесса свой или is_active
+    сменили через QuerySet.update(). Вместе с токеном запоминается
+    его версия в кеше Django, прочитанная до запроса к базе; удаление
+    токена, выход и сохранение пользователя сдвигают версию после
+    коммита, и при общем кеше все процессы сразу перестают доверять
+    записи, даже если успели закешировать ее до коммита. В памяти
+    токен с пользователем хранится сериализованным, чтобы параллельные
+    запросы не делили один объект пользователя.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, token_hash, version):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(token_hash)
+            if entry is not None:
+                _, data, expires, entry_version = entry
+                if expires > now and entry_version == version:
+                    self.entries.move_to_end(token_hash)
+                    self.stats['hits'] += 1
+                    return pickle.loads(data)
+                del self.entries[token_hash]
+            self.stats['misses'] += 1
+        return None
+
+    def set(self, token_hash, token, version):
+        with self.lock:
+            self.entries[token_hash] = (
+                token.user_id,
+                pickle.dumps(token),
+                time.monotonic() + settings.TOKEN_CACHE_LOCAL_TIMEOUT,
+                version,
+            )
+            self.entries.move_to_end(token_hash)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def forget_token(self, key):
+        """Отзывает токен сейчас и после коммита."""
+        token_hash = hash_token(key)
+        self.invalidate((token_hash,))
+        transaction.on_commit(lambda: self.invalidate((token_hash,)))
+
+    def forget_user(self, user_id):
+        """Отзывает токены пользователя сейчас и после коммита.
+
+        Повторный сброс нужен, если параллельный запрос успел
+        прочитать токен из базы до фиксации изменений.
+        """
+        token_hashes = [
+            hash_token(key)
+            for key in Token.objects.filter(
+                user_id=user_id
+            ).values_list('key', flat=True)
+        ]
+        self.invalidate(token_hashes)
+        transaction.on_commit(lambda: self.invalidate(token_hashes))
+
+    def invalidate(self, token_hashes):
+        """Сдвигает версии токенов и забывает их в этом процессе."""
+        for token_hash in token_hashes:
+            bump_generation(get_token_namespace(token_hash))
+            with self.lock:
+                self.entries.pop(token_hash, None)
+
+    def hit_stats(self):
+        """Попадания и промахи кеша токенов в этом процессе."""
+        with self.lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешем токенов вместо запроса к базе.
+
+    В кеш попадают только токены активных пользователей, кеш
+    сбрасывается при удалении токена, выходе пользователя и любом
+    сохранении пользователя (смена пароля, is_active), поэтому
+    ошибки для неактивных и удаленных пользователей те же, что
+    у TokenAuthentication.
+    """
+
+    def authenticate_credentials(self, key):
+        token_hash = hash_token(key)
+        # Версия читается до базы: отзыв, зафиксированный после чтения
+        # токена, сдвинет ее, и запись не будет использована.
+        version, = get_generations((get_token_namespace(token_hash),))
+        token = token_cache.get(token_hash, version)
+        if token is not None:
+            return (token.user, token)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(token_hash, token, version)
+        return (user, token)
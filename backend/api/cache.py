@@ -0,0 +1,149 @@
+import hashlib
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from core.routers import use_primary
+
+GENERATION_KEY = 'foodgram:generation:{}'
+CHANGED_KEY = 'foodgram:generation:{}:changed'
+RESPONSE_KEY = 'foodgram:response:{}:{}:{}:{}'
+STATS_KEY = 'foodgram:response-cache:{}'
+
+
+def get_generations(namespaces):
+    """Текущие поколения данных в пространствах имен."""
+    keys = [GENERATION_KEY.format(namespace) for namespace in namespaces]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generations[key] = cache.get_or_set(key, time.time_ns(), None)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(namespace):
+    """Сдвигает поколение, делая устаревшими все закешированные ответы.
+
+    Если ключ вытеснен из кеша, новое поколение берется из текущего
+    времени, чтобы не совпасть ни с одним из старых. С репликами
+    изменение еще и отмечается на REPLICA_STICKY_SECONDS.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(
+            CHANGED_KEY.format(namespace), 1, settings.REPLICA_STICKY_SECONDS
+        )
+    key = GENERATION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(key, generation, None)
+        return generation
+
+
+def recently_changed(namespaces):
+    """Менялись ли данные за последние REPLICA_STICKY_SECONDS."""
+    return bool(cache.get_many(
+        [CHANGED_KEY.format(namespace) for namespace in namespaces]
+    ))
+
+
+def incr_stat(name):
+    key = STATS_KEY.format(name)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def cache_stats():
+    """Счетчики попаданий и промахов кеша ответов."""
+    hits = cache.get(STATS_KEY.format('hits'), 0)
+    misses = cache.get(STATS_KEY.format('misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def normalize_query(query_params):
+    """Строка запроса с отсортированными параметрами и значениями."""
+    return '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(query_params.lists())
+        for value in sorted(values)
+        if value != ''
+    )
+
+
+class NamespacesMixin:
+    """Пространства имен поколений, от которых зависит ответ вью.
+
+    Общий источник для ключа кеша ответов и ETag, чтобы они
+    сбрасывались одними и теми же изменениями.
+    """
+
+    namespaces = ()
+
+    def get_namespaces(self, request):
+        return self.namespaces
+
+
+class AnonymousCacheMixin(NamespacesMixin):
+    """Кеширует ответы list и retrieve для анонимных пользователей.
+
+    Ключ строится из хоста, пути и нормализованной строки запроса,
+    а также текущих поколений пространств имен из get_namespaces,
+    которые сдвигаются сигналами при изменении моделей. При промахе
+    ответ строится по реплике, выбранной middleware, и кешируется под
+    поколениями, прочитанными до запроса. Только REPLICA_STICKY_SECONDS
+    после изменения данных, пока реплика может отставать, ответ
+    строится по основной базе: иначе старые данные попали бы в кеш
+    под новым поколением.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_key(self, request):
+        generations = '.'.join(
+            map(str, get_generations(self.get_namespaces(request)))
+        )
+        location = hashlib.md5(
+            f'{request.get_host()}{request.path}?'
+            f'{normalize_query(request.query_params)}'.encode()
+        ).hexdigest()
+        return RESPONSE_KEY.format(
+            self.basename, self.action, generations, location
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            incr_stat('hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        incr_stat('misses')
+        lagging = (settings.DATABASE_REPLICAS
+                   and recently_changed(self.get_namespaces(request)))
+        with use_primary() if lagging else nullcontext():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
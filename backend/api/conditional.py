@@ -0,0 +1,98 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import NamespacesMixin, get_generations, normalize_query
+
+
+def make_etag(*parts):
+    return '"{}"'.format(
+        hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def get_user_namespace(user_id):
+    """Пространство имен состояния пользователя: избранное, корзина,
+    подписки."""
+    return f'user:{user_id}'
+
+
+class ConditionalGetMixin(NamespacesMixin):
+    """ETag и Last-Modified для list и retrieve.
+
+    Валидаторы считаются до сериализации, и совпавший If-None-Match
+    сразу получает 304. Last-Modified отдается только анонимным
+    пользователям: для остальных ответ зависит еще и от их избранного,
+    корзины и подписок, которые учитывает только ETag. If-Modified-Since
+    проверяется только для retrieve: удаление объекта из списка
+    не сдвигает время последнего изменения.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_validators(self, request):
+        """Возвращает части ETag и время последнего изменения."""
+        return (), None
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        parts, last_modified = self.get_validators(request)
+        namespaces = tuple(self.get_namespaces(request))
+        if request.user.is_authenticated:
+            namespaces += (get_user_namespace(request.user.pk),)
+        etag = make_etag(
+            self.basename,
+            self.action,
+            request.user.pk,
+            normalize_query(request.query_params),
+            *parts,
+            *get_generations(namespaces),
+        )
+        if request.user.is_authenticated or last_modified is None:
+            last_modified = None
+        else:
+            last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=(
+                last_modified if self.action == 'retrieve' else None
+            ),
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class RecipeConditionalGetMixin(ConditionalGetMixin):
+    """Валидаторы рецептов по полю updated_at.
+
+    ETag списка строится только из поколений: поколение рецептов
+    сдвигается при любом изменении и удалении, поэтому для списка
+    не нужны ни COUNT, ни Max(updated_at) по отфильтрованным рецептам.
+    """
+
+    def get_validators(self, request):
+        if self.action != 'retrieve':
+            return (), None
+        try:
+            last_modified = self.get_queryset().filter(
+                pk=self.kwargs[self.lookup_field]
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            return (), None
+        return (last_modified,), last_modified
@@ -1,7 +1,8 @@
-from django.db.models import Q
+from django.db.models import F, Q
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 
 
 def get_queryset_filter(queryset, user, value, relation):
@@ -36,12 +37,43 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='tags_filter',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='tags_mode_filter',
+    )
+    search = filters.CharFilter(method='search_filter')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'),),
+        method='ordering_filter',
     )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def tags_filter(self, queryset, name, value):
+        """Фильтр по маске тегов без JOIN и DISTINCT."""
+        if not value:
+            return queryset
+        mask = sum(tag.mask for tag in value)
+        queryset = queryset.alias(
+            tags_matched=F('tags_mask').bitand(mask)
+        )
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            return queryset.filter(tags_matched=mask)
+        return queryset.filter(tags_matched__gt=0)
+
+    def tags_mode_filter(self, queryset, name, value):
+        return queryset
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', '-pub_date', '-id')
+
     def is_favorited_filter(self, queryset, name, value):
         return get_queryset_filter(
             queryset=queryset,
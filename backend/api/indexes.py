@@ -0,0 +1,338 @@
+import abc
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from recipes.models import Ingredient, RecipeIngredientAmount
+from recipes.search import fold
+
+from .cache import bump_generation, get_generations
+
+RECIPE_INGREDIENTS = 'recipe_ingredients'
+CHANGES_KEY = 'foodgram:recipe-ingredients:changes:{}'
+
+
+class VersionedIndex(abc.ABC):
+    """Основа индексов в памяти процесса, которые следят за базой.
+
+    Изменения индекс узнает по поколению в кеше. Поколение видно
+    другим процессам, только если кеш общий, поэтому не чаще раза
+    в INDEX_CHECK_SECONDS индекс еще и сверяет свой отпечаток
+    (число строк и т. п., посчитанные по его данным) с тем же
+    агрегатом в базе. Так подхватываются load_catalog, import_recipes
+    и изменения из других воркеров при кеше в памяти процесса.
+    С max_age индекс вдобавок перестраивается по возрасту.
+    """
+
+    namespace = None
+    max_age = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.fingerprint = None
+        self.builds = 0
+        self.built_at = 0.0
+        self.checked_at = 0.0
+
+    @abc.abstractmethod
+    def get_fingerprint(self):
+        """Отпечаток данных индекса, посчитанный в базе."""
+
+    @abc.abstractmethod
+    def build(self):
+        """Строит индекс заново и считает его отпечаток."""
+
+    def is_fresh(self):
+        now = time.monotonic()
+        if now - self.checked_at < settings.INDEX_CHECK_SECONDS:
+            return True
+        self.checked_at = now
+        if self.max_age is not None and now - self.built_at > self.max_age:
+            return False
+        return self.get_fingerprint() == self.fingerprint
+
+    def refresh(self):
+        generation, = get_generations((self.namespace,))
+        if generation == self.generation and self.is_fresh():
+            return
+        builds = self.builds
+        with self.lock:
+            if builds != self.builds:
+                return
+            self.update(generation)
+            self.generation = generation
+            self.checked_at = time.monotonic()
+            self.builds += 1
+
+    def update(self, generation):
+        self.build()
+        self.built_at = time.monotonic()
+
+
+class IngredientIndex(VersionedIndex):
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Строится при первом обращении и перестраивается при изменении
+    ингредиентов, а раз в INGREDIENT_INDEX_MAX_AGE — в любом случае,
+    чтобы подхватить переименования из других процессов. Поиск
+    в базу не ходит.
+    """
+
+    namespace = 'ingredients'
+    max_age = settings.INGREDIENT_INDEX_MAX_AGE
+
+    def __init__(self):
+        super().__init__()
+        self.data = ([], [])
+
+    def get_fingerprint(self):
+        return tuple(Ingredient.objects.aggregate(
+            count=Count('pk'), last=Max('pk')
+        ).values())
+
+    def build(self):
+        entries = sorted(
+            (fold(name), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self.data = (
+            [entry[0] for entry in entries],
+            [
+                {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+                for _, name, pk, measurement_unit in entries
+            ],
+        )
+        self.fingerprint = (
+            len(entries), max((entry[2] for entry in entries), default=None)
+        )
+
+    def search(self, value, limit):
+        """Ингредиенты, начинающиеся с value, затем содержащие value."""
+        self.refresh()
+        names, ingredients = self.data
+        value = fold(value)
+        start = bisect_left(names, value)
+        end = start
+        while (end < len(names) and end - start < limit
+               and names[end].startswith(value)):
+            end += 1
+        found = ingredients[start:end]
+        if len(found) < limit:
+            for name, ingredient in zip(names, ingredients):
+                if value in name and not name.startswith(value):
+                    found.append(ingredient)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+class RecipeIngredientIndex(VersionedIndex):
+    """Обратный индекс ингредиент -> рецепты в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id
+    рецептов, для каждого рецепта — его ингредиенты. Изменения
+    публикуются в кеш вместе с новым поколением, и процессы
+    перечитывают только измененные рецепты; если каких-то изменений
+    в кеше уже нет, индекс строится заново. Отпечаток — число пар
+    рецепт-ингредиент и суммы их id — поддерживается при частичном
+    перечитывании, так что его расхождение с базой замечается и после
+    него.
+    """
+
+    namespace = RECIPE_INGREDIENTS
+
+    def __init__(self):
+        super().__init__()
+        self.data = ({}, {})
+
+    def get_fingerprint(self):
+        return tuple(
+            value or 0
+            for value in RecipeIngredientAmount.objects.aggregate(
+                count=Count('pk'),
+                recipes=Sum('recipe_id'),
+                ingredients=Sum('ingredient_id'),
+            ).values()
+        )
+
+    def build(self):
+        postings = defaultdict(lambda: array('q'))
+        recipes = defaultdict(list)
+        count = recipe_sum = ingredient_sum = 0
+        rows = RecipeIngredientAmount.objects.order_by(
+            'recipe_id'
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows.iterator(
+            chunk_size=settings.RECIPE_INDEX_CHUNK_SIZE
+        ):
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+            count += 1
+            recipe_sum += recipe_id
+            ingredient_sum += ingredient_id
+        self.data = (
+            dict(postings),
+            {
+                recipe_id: frozenset(ingredient_ids)
+                for recipe_id, ingredient_ids in recipes.items()
+            },
+        )
+        self.fingerprint = (count, recipe_sum, ingredient_sum)
+
+    def reload(self, recipe_ids):
+        """Перечитывает ингредиенты recipe_ids.
+
+        Измененные массивы копируются и подменяются целиком, чтобы
+        параллельные запросы видели либо старую, либо новую версию.
+        """
+        postings, recipes = self.data
+        count, recipe_sum, ingredient_sum = self.fingerprint
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        changed = {}
+        for recipe_id in recipe_ids:
+            old = recipes.get(recipe_id, frozenset())
+            new = frozenset(current.get(recipe_id, ()))
+            for ingredient_id in old ^ new:
+                posting = changed.get(ingredient_id)
+                if posting is None:
+                    posting = changed[ingredient_id] = array(
+                        'q', postings.get(ingredient_id, ())
+                    )
+                position = bisect_left(posting, recipe_id)
+                sign = 1 if ingredient_id in new else -1
+                if sign > 0:
+                    posting.insert(position, recipe_id)
+                else:
+                    del posting[position]
+                count += sign
+                recipe_sum += sign * recipe_id
+                ingredient_sum += sign * ingredient_id
+            if new:
+                recipes[recipe_id] = new
+            else:
+                recipes.pop(recipe_id, None)
+        for ingredient_id, posting in changed.items():
+            if posting:
+                postings[ingredient_id] = posting
+            else:
+                postings.pop(ingredient_id, None)
+        self.fingerprint = (count, recipe_sum, ingredient_sum)
+
+    def update(self, generation):
+        if (self.generation is not None
+                and 0 < generation - self.generation
+                <= settings.RECIPE_INDEX_MAX_CHANGES):
+            keys = [
+                CHANGES_KEY.format(number)
+                for number in range(self.generation + 1, generation + 1)
+            ]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                self.reload(set().union(*changes.values()))
+                return
+        super().update(generation)
+
+    def cover(self, ingredient_ids, exclude_ids=(), min_coverage=0):
+        """Рецепты с долей имеющихся ингредиентов не меньше min_coverage.
+
+        Рецепты с ингредиентами из exclude_ids пропускаются.
+        """
+        self.refresh()
+        postings, recipes = self.data
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        excluded = set()
+        for ingredient_id in set(exclude_ids):
+            excluded.update(postings.get(ingredient_id, ()))
+        ranking = []
+        for recipe_id, count in matched.items():
+            total = len(recipes.get(recipe_id, ()))
+            if total and recipe_id not in excluded:
+                if count / total >= min_coverage:
+                    ranking.append(
+                        (-count / total, -count, -recipe_id, total - count)
+                    )
+        return Ranking(ranking)
+
+
+class Ranking:
+    """Результаты подбора, упорядоченные только в запрошенном срезе.
+
+    Срез с начала списка выбирается через heapq.nsmallest без полной
+    сортировки; элементы — кортежи (доля, число имеющихся, число
+    недостающих, id рецепта).
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return [
+            (-coverage, -count, missing, -recipe_id)
+            for coverage, count, recipe_id, missing in heapq.nsmallest(
+                index.stop, self.items
+            )[index]
+        ]
+
+
+class RecipeIngredientChanges:
+    """Рецепты, ингредиенты которых изменились в текущей транзакции.
+
+    Вызывается после коммита и публикует их одним поколением.
+    """
+
+    def __init__(self, recipe_ids):
+        self.recipe_ids = recipe_ids
+        self.published = False
+
+    def __call__(self):
+        self.published = True
+        generation = bump_generation(RECIPE_INGREDIENTS)
+        cache.set(
+            CHANGES_KEY.format(generation),
+            self.recipe_ids,
+            settings.RECIPE_INDEX_CHANGES_TIMEOUT,
+        )
+
+
+def recipe_ingredients_changed(recipe_ids):
+    """Публикует после коммита id рецептов с изменившимися ингредиентами.
+
+    Все изменения одной транзакции, например удаление рецепта со всеми
+    его ингредиентами, копятся и публикуются одним поколением.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        for entry in connection.run_on_commit:
+            changes = entry[1]
+            if (isinstance(changes, RecipeIngredientChanges)
+                    and not changes.published):
+                changes.recipe_ids |= recipe_ids
+                return
+    transaction.on_commit(RecipeIngredientChanges(recipe_ids))
+
+
+ingredient_index = IngredientIndex()
+recipe_index = RecipeIngredientIndex()
@@ -0,0 +1,116 @@
+from django.db.models import (OuterRef, Prefetch, Subquery,
+                              prefetch_related_objects)
+
+from core.concurrency import run_concurrently
+from recipes.models import (Cart, FavoriteRecipe, Recipe,
+                            RecipeIngredientAmount)
+from users.models import Subscription
+
+
+def get_recipe_ids(model, user, recipe_ids):
+    """Множество id рецептов из recipe_ids, связанных с пользователем."""
+    return set(
+        model.objects.filter(
+            user=user,
+            recipe_id__in=recipe_ids,
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+def get_subscribed_ids(user, author_ids):
+    """Множество id авторов из author_ids, на которых подписан user."""
+    return set(
+        Subscription.objects.filter(
+            user=user,
+            author_id__in=author_ids,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def load_users(users, user):
+    """Досчитывает is_subscribed для страницы пользователей."""
+    users = list(users)
+    subscribed = set()
+    if users and user.is_authenticated:
+        subscribed = get_subscribed_ids(user, [author.id for author in users])
+    for author in users:
+        author.is_subscribed = author.id in subscribed
+    return users
+
+
+def load_recipes(recipes, user):
+    """Загружает связанные данные для страницы рецептов.
+
+    Авторы, теги и ингредиенты с количеством подтягиваются
+    prefetch-запросами на всю страницу, флаги избранного, корзины
+    и подписки на автора считаются по множествам id. Множества id
+    запрашиваются одновременно с prefetch (см. run_concurrently).
+    Число запросов не зависит от размера страницы.
+    """
+    recipes = list(recipes)
+    calls = [(
+        prefetch_related_objects,
+        recipes,
+        'author',
+        'tags',
+        Prefetch(
+            'recipeingredientamount_set',
+            queryset=RecipeIngredientAmount.objects.select_related(
+                'ingredient'
+            ).order_by('ingredient__name'),
+        ),
+    )]
+    if recipes and user.is_authenticated:
+        recipe_ids = [recipe.id for recipe in recipes]
+        calls += [
+            (get_recipe_ids, FavoriteRecipe, user, recipe_ids),
+            (get_recipe_ids, Cart, user, recipe_ids),
+            (
+                get_subscribed_ids,
+                user,
+                {recipe.author_id for recipe in recipes},
+            ),
+        ]
+    _, *id_sets = run_concurrently(*calls)
+    favorited, in_shopping_cart, subscribed = id_sets or (set(),) * 3
+    for recipe in recipes:
+        recipe.is_favorited = recipe.id in favorited
+        recipe.is_in_shopping_cart = recipe.id in in_shopping_cart
+        recipe.author.is_subscribed = recipe.author_id in subscribed
+    return recipes
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
+
+
+def load_subscriptions(authors, recipes_limit=None):
+    """Загружает рецепты для страницы авторов из подписок.
+
+    Рецепты всех авторов страницы выбираются одним запросом,
+    ограничение recipes_limit на автора применяется в SQL
+    коррелированным подзапросом. Все авторы на странице уже
+    в подписках, поэтому is_subscribed не запрашивается.
+    """
+    authors = list(authors)
+    recipes = Recipe.objects.all()
+    if recipes_limit:
+        recipes = recipes.filter(
+            pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            )
+        )
+    prefetch_related_objects(
+        authors,
+        Prefetch('recipe_author', queryset=recipes, to_attr='recipes'),
+    )
+    for author in authors:
+        author.is_subscribed = True
+    return authors
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from api.cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша ответов API.'
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["hit_rate"]:.1%}'
+        )
@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from api.transfer import stream_ndjson, write_zip
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты в NDJSON с картинками в base64 '
+        'или в zip с картинками отдельными файлами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Файл .ndjson или .zip; по умолчанию NDJSON в stdout.',
+        )
+        parser.add_argument('--author', help='Только рецепты автора.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['author']:
+            recipes = recipes.filter(author__username=options['author'])
+        output = options['output']
+        if output and output.endswith('.zip'):
+            with open(output, 'wb') as file:
+                write_zip(recipes, file)
+        elif output:
+            with open(output, 'w', encoding='utf-8') as file:
+                file.writelines(stream_ndjson(recipes))
+        else:
+            for line in stream_ndjson(recipes):
+                self.stdout.write(line, ending='')
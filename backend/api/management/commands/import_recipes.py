@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from api.transfer import RecipeImporter, open_source
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Импортирует рецепты из NDJSON или zip с NDJSON и картинками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--author',
+            help='Автор всех рецептов; по умолчанию поле author в строке.',
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.'
+                )
+        try:
+            with open(options['path'], 'rb') as file:
+                lines, archive = open_source(file)
+                report = RecipeImporter(
+                    author=author,
+                    archive=archive,
+                    batch_size=options['batch_size'],
+                ).run(enumerate(lines, 1))
+        except (OSError, ValidationError) as error:
+            raise CommandError(f'Импорт прерван: {error}')
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено рецептов: {report["created"]}, '
+            f'с ошибками: {report["failed"]}.'
+        ))
@@ -1,5 +1,8 @@
 from django.conf import settings
 from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import FeedEntry
 
 
 class CustomPagination(pagination.PageNumberPagination):
@@ -9,8 +12,73 @@ class CustomPagination(pagination.PageNumberPagination):
     max_page_size = settings.LIMIT_PAG
 
 
-class CartPagination(pagination.LimitOffsetPagination):
-    default_limit = settings.LIMIT_PAG
-    page_query_param = 'page'
+class RecipeCursorPagination(pagination.CursorPagination):
+    """Курсорная пагинация рецептов без COUNT и OFFSET."""
+    page_size = settings.LIMIT_PAG_SIZE
     page_size_query_param = 'limit'
-    max_limit = settings.LIMIT_PAG
+    max_page_size = settings.LIMIT_PAG
+    ordering = ('-pub_date', '-id')
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """Курсорная пагинация ленты по записям ленты или по рецептам.
+
+    Позиция курсора в обоих случаях — дата публикации, поэтому
+    курсор остается рабочим, если способ сборки ленты сменился.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.model is FeedEntry:
+            return ('-pub_date', '-recipe_id')
+        return self.ordering
+
+
+class UserCursorPagination(RecipeCursorPagination):
+    """Курсорная пагинация пользователей и подписок."""
+    ordering = ('username',)
+
+
+class OptionalCursorPagination(CustomPagination):
+    """Постраничная пагинация с курсорным режимом по запросу.
+
+    Курсорный режим включается параметром pagination=cursor,
+    ссылки next и previous его сохраняют. Без параметра работает
+    прежний контракт page/limit. Курсор движется по полям ordering
+    курсорной пагинации, поэтому запрос с собственной сортировкой
+    (популярность, релевантность поиска) в этом режиме отклоняется.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+    cursor_mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.cursor_mode_query_param)
+                == 'cursor'):
+            if queryset.query.order_by:
+                raise ValidationError({
+                    self.cursor_mode_query_param: [
+                        'Курсорная пагинация недоступна при сортировке '
+                        'по популярности и поиске.'
+                    ],
+                })
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class UserOptionalCursorPagination(OptionalCursorPagination):
+    cursor_pagination_class = UserCursorPagination
@@ -1,17 +1,66 @@
 from django.conf import settings
-from django.db.models import F
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        PrimaryKeyRelatedField,
-                                        SerializerMethodField)
+from rest_framework.serializers import (BooleanField, CharField,
+                                        FloatField, IntegerField, ListField,
+                                        ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer,
+                                        SerializerMethodField, SlugField)
 from rest_framework.status import HTTP_400_BAD_REQUEST
 
+from recipes.images import normalize_image
 from recipes.models import (Cart, Ingredient, Recipe, RecipeIngredientAmount,
                             Tag)
+from recipes.shopping import recipe_amounts_changed
 from users.models import User
 
+from .indexes import recipe_ingredients_changed
+from .loaders import load_recipes
+
+
+def get_image_urls(recipe, request=None):
+    """Ссылки на уменьшенные копии картинки рецепта.
+
+    Пока копии не построены, вместо них отдается оригинал.
+    """
+    if not recipe.image:
+        return {}
+    storage = recipe.image.storage
+    variants = recipe.image_variants
+    if variants.get('source') != recipe.image.name:
+        variants = {}
+    urls = {}
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        urls[variant] = storage.url(variants.get(variant, recipe.image.name))
+        if f'{variant}_webp' in variants:
+            urls[f'{variant}_webp'] = storage.url(variants[f'{variant}_webp'])
+    if request is not None:
+        urls = {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+    return urls
+
+
+class RecipeImageField(Base64ImageField):
+    """Картинка рецепта с ограничением размера и перекодированием."""
+
+    def to_internal_value(self, data):
+        if (isinstance(data, str)
+                and len(data) > settings.RECIPE_IMAGE_MAX_SIZE * 4 // 3 + 64):
+            raise ValidationError('Картинка слишком большая!')
+        image = super().to_internal_value(data)
+        if image is None:
+            return None
+        if image.size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError('Картинка слишком большая!')
+        if max(image.image.size) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+            raise ValidationError('Слишком большое разрешение картинки!')
+        image.seek(0)
+        return normalize_image(image)
+
 
 class CartSerializer(ModelSerializer):
     """Сериализатор для модели Cart."""
@@ -25,6 +74,7 @@ class CartSerializer(ModelSerializer):
 class IndexSerializer(ModelSerializer):
     """Сокращенная модель Рецептов."""
     image = Base64ImageField()
+    images = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -32,15 +82,20 @@ class IndexSerializer(ModelSerializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time',
         )
         read_only_fields = (
             'id',
             'name',
             'image',
+            'images',
             'cooking_time',
         )
 
+    def get_images(self, obj):
+        return get_image_urls(obj, self.context.get('request'))
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Кастомный сериализатор от джосер, для создания пользователя."""
@@ -73,6 +128,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return (not user.is_anonymous and user.subscriber_user.filter(
             author=obj).exists())
@@ -105,16 +162,11 @@ class SubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.recipe_author.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        request = self.context['request']
-        recipes_limit = request.GET.get('recipes_limit')
-        recipes = obj.recipe_author.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
         return IndexSerializer(
-            recipes, many=True, read_only=True
+            obj.recipes, many=True, read_only=True
         ).data
 
     def validate(self, data):
@@ -151,6 +203,33 @@ class IngredientSerializer(ModelSerializer):
         read_only_fields = ('__all__',)
 
 
+class ShoppingListItemSerializer(Serializer):
+    """Сериализатор строки списка покупок в базовой единице измерения."""
+
+    name = CharField()
+    measurement_unit = CharField()
+    amount = IntegerField(source='total')
+
+
+class CartServingsSerializer(Serializer):
+    """Число порций рецепта в корзине."""
+
+    servings = IntegerField(
+        min_value=settings.MIN_SERVINGS,
+        max_value=settings.MAX_SERVINGS,
+        default=settings.MIN_SERVINGS,
+    )
+
+
+class CartServingsUpdateSerializer(Serializer):
+    """Новое число порций рецепта в корзине, обязательно при изменении."""
+
+    servings = IntegerField(
+        min_value=settings.MIN_SERVINGS,
+        max_value=settings.MAX_SERVINGS,
+    )
+
+
 class RecipeIngredientAmountSerializer(ModelSerializer):
     """Сериализатор игредиента в рецепте."""
 
@@ -171,9 +250,10 @@ class ReadRecipeSerializer(ModelSerializer):
 
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    is_favorited = SerializerMethodField()
-    is_in_shopping_cart = SerializerMethodField()
+    is_favorited = BooleanField(read_only=True)
+    is_in_shopping_cart = BooleanField(read_only=True)
     ingredients = SerializerMethodField()
+    images = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -186,32 +266,50 @@ class ReadRecipeSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
 
-    def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user and not user.is_anonymous:
-            related_manager = getattr(user, 'favorites')
-            return related_manager.filter(recipe=obj).exists()
-        return False
-
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if not user.is_anonymous:
-            related_manager = getattr(user, 'shopping_cart')
-            return related_manager.filter(recipe=obj).exists()
-        return False
+    def get_images(self, obj):
+        return get_image_urls(obj, self.context.get('request'))
 
     def get_ingredients(self, obj):
-        return (
-            obj.ingredients.values(
-                'id',
-                'name',
-                'measurement_unit',
-                amount=F('recipeingredientamount__amount')
-            )
+        return [
+            {
+                'id': ingredient_amount.ingredient.id,
+                'name': ingredient_amount.ingredient.name,
+                'measurement_unit': (
+                    ingredient_amount.ingredient.measurement_unit
+                ),
+                'amount': ingredient_amount.amount,
+            }
+            for ingredient_amount in obj.recipeingredientamount_set.all()
+        ]
+
+
+class CoverageQuerySerializer(Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+
+    ingredients = ListField(
+        child=IntegerField(min_value=1), allow_empty=False
+    )
+    exclude = ListField(
+        child=IntegerField(min_value=1), required=False, default=list
+    )
+    min_coverage = FloatField(min_value=0, max_value=1, default=0)
+
+
+class CoverageRecipeSerializer(ReadRecipeSerializer):
+    """Рецепт с долей ингредиентов, которые уже есть у пользователя."""
+
+    coverage = FloatField(read_only=True)
+    missing_count = IntegerField(read_only=True)
+
+    class Meta(ReadRecipeSerializer.Meta):
+        fields = ReadRecipeSerializer.Meta.fields + (
+            'coverage',
+            'missing_count',
         )
 
 
@@ -223,7 +321,7 @@ class WriteRecipeSerializer(ModelSerializer):
         queryset=Tag.objects.all(),
         many=True,
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
     author = CustomUserSerializer(read_only=True)
     cooking_time = IntegerField(
         min_value=settings.MIN_COOKING_TIME,
@@ -258,13 +356,22 @@ class WriteRecipeSerializer(ModelSerializer):
             raise ValidationError({
                 "ingredients": "Нельзя добавлять без ингредиентов!"
             })
-        ingredients_in_recipe = []
-        for ingredient in ingredients:
-            if ingredient in ingredients_in_recipe:
-                raise ValidationError({
-                    "ingredients": "Вы уже добавили этот ингредиент!"
-                })
-            ingredients_in_recipe.append(ingredient)
+        ingredient_ids = {ingredient['id'] for ingredient in ingredients}
+        if len(ingredient_ids) != len(ingredients):
+            raise ValidationError({
+                "ingredients": "Вы уже добавили этот ингредиент!"
+            })
+        missing = ingredient_ids - set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list('id', flat=True)
+        )
+        if missing:
+            raise ValidationError({
+                "ingredients": "Нет ингредиентов с id: {}".format(
+                    ', '.join(map(str, sorted(missing)))
+                )
+            })
         return value
 
     def validate_tags(self, value):
@@ -275,52 +382,146 @@ class WriteRecipeSerializer(ModelSerializer):
             raise ValidationError({
                 "tags": "Добавьте хотя бы один тег!"
             })
-        tags_in_recipe = []
-        for tag in tags:
-            if tag in tags_in_recipe:
-                raise ValidationError({
-                    "tags": "Этот тег уже выбран!"
-                })
-            tags_in_recipe.append(tag)
+        if len(set(tags)) != len(tags):
+            raise ValidationError({
+                "tags": "Этот тег уже выбран!"
+            })
         return value
 
+    def set_tags(self, recipe, tags, current=()):
+        """Добавляет и убирает только изменившиеся теги."""
+        tags = {tag.id for tag in tags}
+        current = {tag.id for tag in current}
+        if tags - current:
+            recipe.tags.add(*(tags - current))
+        if current - tags:
+            recipe.tags.remove(*(current - tags))
+
+    def set_ingredients(self, recipe, ingredients, current=()):
+        """Сверяет ингредиенты с сохраненными и пишет только разницу.
+
+        Разница переносится в списки покупок пользователей, у которых
+        рецепт в корзине.
+        """
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {row.ingredient_id: row for row in current}
+        deltas = {}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredientAmount.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed,
+            ).delete()
+            for ingredient_id in removed:
+                deltas[ingredient_id] = -current[ingredient_id].amount
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if amount != row.amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredientAmount.objects.bulk_update(changed, ('amount',))
+        added = amounts.keys() - current.keys()
+        RecipeIngredientAmount.objects.bulk_create(
+            [RecipeIngredientAmount(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id]
+            ) for ingredient_id in added]
+        )
+        if added:
+            # bulk_create не отправляет сигналы, удаление публикуется ими.
+            recipe_ingredients_changed([recipe.pk])
+        if current:
+            for ingredient_id in added:
+                deltas[ingredient_id] = amounts[ingredient_id]
+            recipe_amounts_changed(recipe.pk, deltas)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-
-        RecipeIngredientAmount.objects.bulk_create(
-            [RecipeIngredientAmount(
-                recipe=recipe,
-                ingredient_id=ingredient['id'],
-                amount=ingredient['amount']
-            ) for ingredient in ingredients]
-        )
+        self.set_tags(recipe, tags)
+        self.set_ingredients(recipe, ingredients)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'tags' in validated_data:
-            instance.tags.clear()
-            instance.tags.set(validated_data.pop('tags'))
+            self.set_tags(
+                instance,
+                validated_data.pop('tags'),
+                instance.tags.all(),
+            )
         if 'ingredients' in validated_data:
-            RecipeIngredientAmount.objects.filter(recipe=instance).delete()
-            ingredients = validated_data.pop('ingredients')
-            RecipeIngredientAmount.objects.bulk_create(
-                [RecipeIngredientAmount(
-                    recipe=instance,
-                    ingredient_id=ingredient['id'],
-                    amount=ingredient['amount']
-                ) for ingredient in ingredients]
+            self.set_ingredients(
+                instance,
+                validated_data.pop('ingredients'),
+                instance.recipeingredientamount_set.all(),
             )
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context['request']
         context = {'request': request}
+        load_recipes([instance], request.user)
         return ReadRecipeSerializer(
             instance=instance,
             context=context,
         ).data
+
+
+class ImportIngredientSerializer(Serializer):
+    """Ингредиент рецепта в файле импорта."""
+
+    name = CharField(
+        max_length=settings.MAX_NAME_SLUG_MEASUREMENT_UNIT_LENGHT
+    )
+    measurement_unit = CharField(
+        max_length=settings.MAX_NAME_SLUG_MEASUREMENT_UNIT_LENGHT
+    )
+    amount = IntegerField(min_value=settings.MIN_AMOUNT,
+                          max_value=settings.MAX_AMOUNT)
+
+
+class ImportRecipeSerializer(Serializer):
+    """Строка файла импорта рецептов.
+
+    Теги указываются по slug, ингредиенты по названию и единицам
+    измерения, чтобы файл можно было перенести между окружениями.
+    """
+
+    author = CharField(required=False)
+    name = CharField(
+        max_length=settings.MAX_NAME_SLUG_MEASUREMENT_UNIT_LENGHT
+    )
+    text = CharField()
+    cooking_time = IntegerField(
+        min_value=settings.MIN_COOKING_TIME,
+        max_value=settings.MAX_COOKING_TIME
+    )
+    image = RecipeImageField()
+    tags = ListField(child=SlugField(), allow_empty=False)
+    ingredients = ImportIngredientSerializer(many=True, allow_empty=False)
+
+    def validate_tags(self, value):
+        if len(set(value)) != len(value):
+            raise ValidationError('Этот тег уже выбран!')
+        return value
+
+    def validate_ingredients(self, value):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for ingredient in value
+        }
+        if len(keys) != len(value):
+            raise ValidationError('Вы уже добавили этот ингредиент!')
+        return value
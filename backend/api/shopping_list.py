@@ -0,0 +1,220 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import BigIntegerField, F, Sum
+from django.db.models.functions import Cast
+
+from recipes.models import ShoppingListItem
+from recipes.units import base_unit, to_base_unit
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 14
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+
+# Имена глифов кириллицы в порядке кодировки cp1251.
+CYRILLIC_GLYPHS = ' '.join(
+    [
+        '168 /afii10023',
+        '184 /afii10071',
+        '192',
+    ] + [
+        f'/afii{10017 + index + (index >= 6)}' for index in range(32)
+    ] + [
+        f'/afii{10065 + index + (index >= 6)}' for index in range(32)
+    ]
+)
+
+
+def get_shopping_list(user):
+    """Суммарное количество ингредиентов из корзины пользователя.
+
+    Суммы по рецептам с учетом порций уже посчитаны в ShoppingListItem.
+    Запрос переводит их в базовые единицы (кг в г, л в мл, ...)
+    и группирует по названию и базовой единице, так что ингредиент
+    в граммах и килограммах дает одну строку.
+    """
+    return ShoppingListItem.objects.filter(user=user).values(
+        name=F('ingredient__name'),
+        measurement_unit=base_unit('ingredient__measurement_unit'),
+    ).annotate(
+        # Сумма bigint в PostgreSQL — numeric, приводится обратно.
+        total=Cast(
+            Sum(to_base_unit('amount', 'ingredient__measurement_unit')),
+            BigIntegerField(),
+        ),
+    ).order_by('name', 'measurement_unit')
+
+
+def iter_ingredients(user):
+    """Построчно читает список покупок курсором на стороне сервера."""
+    for ingredient in get_shopping_list(user).iterator(
+        chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+    ):
+        yield (
+            ingredient['name'],
+            ingredient['measurement_unit'],
+            ingredient['total'],
+        )
+
+
+def get_title(user, date):
+    return f'Список покупок для {user.first_name} от {date:%d.%m.%Y}!'
+
+
+def iter_lines(user, date):
+    yield get_title(user, date)
+    yield ''
+    yield 'Потребуются:'
+    yield ''
+    for name, measurement_unit, amount in iter_ingredients(user):
+        yield f' - {name} ({measurement_unit}) - {amount}'
+    yield ''
+    yield 'Foodgram.'
+
+
+def stream_txt(user, date):
+    for line in iter_lines(user, date):
+        yield f'{line}\n'
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(user, date):
+    writer = csv.writer(Echo())
+    yield '﻿'
+    yield writer.writerow(('Ингредиент', 'Единицы измерения', 'Количество'))
+    for row in iter_ingredients(user):
+        yield writer.writerow(row)
+
+
+def stream_json(user, date):
+    yield (
+        f'{{"user": {json.dumps(user.username, ensure_ascii=False)}, '
+        f'"date": "{date.isoformat()}", "ingredients": ['
+    )
+    separator = ''
+    for name, measurement_unit, amount in iter_ingredients(user):
+        yield separator + json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            },
+            ensure_ascii=False,
+        )
+        separator = ', '
+    yield ']}'
+
+
+def pdf_string(line):
+    text = line.encode('cp1251', errors='replace')
+    for char in (b'\\', b'(', b')'):
+        text = text.replace(char, b'\\' + char)
+    return b'(' + text + b')'
+
+
+class PDFWriter:
+    """Потоковая запись PDF со страницами простого текста.
+
+    Страницы отдаются по мере заполнения, в памяти остаются только
+    смещения объектов для таблицы xref. Используется стандартный шрифт
+    Helvetica с кодировкой cp1251 для кириллицы. Шрифт не встраивается,
+    а глифов кириллицы в Helvetica нет: их подставляет программа
+    просмотра (браузеры, poppler, Preview), Acrobat без подходящего
+    системного шрифта показывает вместо них точки.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 4
+
+    def write(self, data):
+        self.offset += len(data)
+        return data
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.offset
+        return self.write(
+            f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n'
+        )
+
+    def header(self):
+        yield self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        yield self.write_object(3, (
+            '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            '/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+            f'/Differences [{CYRILLIC_GLYPHS}] >> >>'
+        ).encode())
+
+    def page(self, lines):
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.pages.append(page_id)
+        content = b''.join([
+            f'BT /F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL '
+            f'{PDF_MARGIN} {PDF_PAGE_HEIGHT - PDF_MARGIN} Td\n'.encode(),
+            b''.join(pdf_string(line) + b' Tj T*\n' for line in lines),
+            b'ET',
+        ])
+        yield self.write_object(content_id, (
+            f'<< /Length {len(content)} >>\nstream\n'.encode()
+            + content + b'\nendstream'
+        ))
+        yield self.write_object(page_id, (
+            '<< /Type /Page /Parent 2 0 R '
+            f'/MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] '
+            f'/Contents {content_id} 0 R '
+            '/Resources << /Font << /F1 3 0 R >> >> >>'
+        ).encode())
+
+    def footer(self):
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.pages)
+        yield self.write_object(2, (
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'
+        ).encode())
+        xref_offset = self.offset
+        yield self.write(b''.join(
+            [f'xref\n0 {self.next_id}\n0000000000 65535 f \n'.encode()]
+            + [
+                f'{self.offsets[object_id]:010d} 00000 n \n'.encode()
+                for object_id in range(1, self.next_id)
+            ]
+        ))
+        yield self.write((
+            f'trailer\n<< /Size {self.next_id} /Root 1 0 R >>\n'
+            f'startxref\n{xref_offset}\n%%EOF\n'
+        ).encode())
+
+
+def stream_pdf(user, date):
+    writer = PDFWriter()
+    yield from writer.header()
+    lines = []
+    for line in iter_lines(user, date):
+        lines.append(line)
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield from writer.page(lines)
+            lines = []
+    if lines:
+        yield from writer.page(lines)
+    yield from writer.footer()
+
+
+SHOPPING_LIST_STREAMS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+    'pdf': stream_pdf,
+}
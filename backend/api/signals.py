@@ -0,0 +1,91 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Cart, FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredientAmount, Tag)
+from recipes.signals import catalog_changed
+
+from users.models import Subscription, User
+
+from .authentication import token_cache
+from .cache import bump_generation
+from .conditional import get_user_namespace
+from .indexes import RECIPE_INGREDIENTS, recipe_ingredients_changed
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredientAmount)
+@receiver(post_delete, sender=RecipeIngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(catalog_changed, sender=Recipe)
+def recipes_changed(sender, **kwargs):
+    bump_generation('recipes')
+
+
+@receiver(post_save, sender=RecipeIngredientAmount)
+@receiver(post_delete, sender=RecipeIngredientAmount)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    recipe_ingredients_changed([instance.recipe_id])
+
+
+@receiver(catalog_changed, sender=Recipe)
+def recipe_ingredients_reloaded(sender, **kwargs):
+    bump_generation(RECIPE_INGREDIENTS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(catalog_changed, sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_generation('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(catalog_changed, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_generation('ingredients')
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def user_state_changed(sender, instance, **kwargs):
+    bump_generation(get_user_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorites_changed(sender, **kwargs):
+    bump_generation('favorites')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    """Рецепты включают данные автора; вход пользователя их не меняет."""
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        bump_generation('recipes')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def token_user_changed(sender, instance, **kwargs):
+    token_cache.forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.forget_token(instance.key)
+
+
+@receiver(user_logged_out)
+def token_user_logged_out(sender, user, **kwargs):
+    if user is not None:
+        token_cache.forget_user(user.pk)
@@ -0,0 +1,60 @@
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from users.models import User
+
+from ..authentication import (CachedTokenAuthentication, get_token_namespace,
+                              hash_token, token_cache)
+from ..cache import get_generations
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Кеш токенов не переживает отзыв токена и отключение пользователя."""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.token.key)
+
+    def test_cached_token_skips_database(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+
+    def test_logout_revokes_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_token_read_before_commit_is_not_trusted(self):
+        token_hash = hash_token(self.token.key)
+        # Запрос прочитал версию и токен до коммита выхода, а записал
+        # токен в кеш уже после него.
+        version, = get_generations((get_token_namespace(token_hash),))
+        with self.captureOnCommitCallbacks(execute=True):
+            token_cache.forget_user(self.user.pk)
+        token_cache.set(token_hash, self.token, version)
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    @override_settings(TOKEN_CACHE_LOCAL_TIMEOUT=0)
+    def test_update_without_signals_is_seen_after_local_timeout(self):
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import FavoriteRecipe, Recipe
+from users.models import User
+
+
+class AnonymousRecipeCacheTest(TestCase):
+    """Кеш ответов анонимным пользователям сбрасывается теми же
+    изменениями, что и ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text='Рецепт.',
+                cooking_time=10,
+                image='recipes/images/soup.jpg',
+            )
+            for name in ('Суп', 'Каша')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_names(self, query=''):
+        response = self.client.get(f'/api/recipes/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            recipe['name'] for recipe in response.json()['results']
+        ]
+
+    def test_popular_order_follows_favorites(self):
+        _, names = self.get_names('?ordering=popular')
+        response, cached = self.get_names('?ordering=popular')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(cached, names)
+        last = Recipe.objects.get(name=names[-1])
+        FavoriteRecipe.objects.create(user=self.author, recipe=last)
+        response, names = self.get_names('?ordering=popular')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(names[0], last.name)
+
+    def test_author_changes_reach_anonymous_users(self):
+        detail = f'/api/recipes/{self.recipes[0].pk}/'
+        etags = {}
+        for path in ('/api/recipes/', detail):
+            etags[path] = self.client.get(path)['ETag']
+            self.assertEqual(self.client.get(path)['X-Cache'], 'HIT')
+        self.author.first_name = 'Повар'
+        self.author.save()
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                data = response.json()
+                for recipe in data.get('results', [data]):
+                    self.assertEqual(
+                        recipe['author']['first_name'], 'Повар'
+                    )
@@ -0,0 +1,45 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeListConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )
+
+    def test_list_etag_without_queries(self):
+        anonymous, authenticated = APIClient(), APIClient()
+        authenticated.force_authenticate(self.author)
+        for client in (anonymous, authenticated):
+            with self.subTest(authenticated=client is authenticated):
+                response = client.get('/api/recipes/?limit=5')
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                etag = response['ETag']
+                with self.assertNumQueries(0):
+                    response = client.get(
+                        '/api/recipes/?limit=5',
+                        HTTP_IF_NONE_MATCH=etag,
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.recipe.save()
+                response = client.get(
+                    '/api/recipes/?limit=5', HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, 200)
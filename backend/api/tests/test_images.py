@@ -0,0 +1,99 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+from ..serializers import get_image_urls
+
+
+class RecipeImageVariantsTest(TestCase):
+    """Уменьшенные копии картинки строятся после сохранения рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='свекла', measurement_unit='г'
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'name': 'Борщ',
+                'text': 'Рецепт борща.',
+                'cooking_time': 90,
+                'tags': [self.tag.pk],
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 300}],
+                'image': 'data:image/png;base64,' + base64.b64encode(
+                    buffer.getvalue()
+                ).decode(),
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Recipe.objects.get()
+
+    def test_variants(self):
+        recipe = self.upload((1600, 1000))
+        variants = recipe.image_variants
+        self.assertEqual(variants['source'], recipe.image.name)
+        expected = {
+            variant: (size, size * 1000 // 1600)
+            for variant, size in settings.RECIPE_IMAGE_VARIANTS.items()
+        }
+        for variant, size in expected.items():
+            for key, image_format in ((variant, 'JPEG'),
+                                      (f'{variant}_webp', 'WEBP')):
+                with default_storage.open(variants[key]) as file, \
+                        Image.open(file) as image:
+                    self.assertEqual(
+                        (image.format, image.size), (image_format, size)
+                    )
+        urls = get_image_urls(recipe)
+        self.assertEqual(
+            urls,
+            {key: default_storage.url(variants[key])
+             for key in variants if key != 'source'},
+        )
+        response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(
+            response.json()['images'],
+            {key: f'http://testserver{url}' for key, url in urls.items()},
+        )
+
+    def test_urls_before_variants(self):
+        recipe = self.upload((300, 200))
+        recipe.image_variants = {}
+        self.assertEqual(
+            get_image_urls(recipe),
+            dict.fromkeys(
+                settings.RECIPE_IMAGE_VARIANTS,
+                default_storage.url(recipe.image.name),
+            ),
+        )
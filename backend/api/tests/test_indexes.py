@@ -0,0 +1,90 @@
+from django.test import TestCase, override_settings
+
+from recipes.models import Ingredient, Recipe, RecipeIngredientAmount
+from users.models import User
+
+from ..cache import get_generations
+from ..indexes import (RECIPE_INGREDIENTS, IngredientIndex,
+                       RecipeIngredientChanges, RecipeIngredientIndex)
+
+
+@override_settings(INDEX_CHECK_SECONDS=0)
+class IngredientIndexTest(TestCase):
+    """Индекс ингредиентов видит изменения без поколения в кеше."""
+
+    def test_external_changes(self):
+        index = IngredientIndex()
+        Ingredient.objects.create(name='сахар', measurement_unit='г')
+        self.assertEqual(len(index.search('сах', 10)), 1)
+        # bulk_create не отправляет сигналы, как load_catalog в другом
+        # процессе, который не делит с сервером кеш.
+        Ingredient.objects.bulk_create([
+            Ingredient(name='сахарная пудра', measurement_unit='г'),
+        ])
+        self.assertEqual(
+            [found['name'] for found in index.search('сах', 10)],
+            ['сахар', 'сахарная пудра'],
+        )
+        Ingredient.objects.filter(name='сахар').delete()
+        self.assertEqual(len(index.search('сах', 10)), 1)
+
+
+@override_settings(INDEX_CHECK_SECONDS=0)
+class RecipeIngredientIndexTest(TestCase):
+    """Обратный индекс публикует транзакцию одним поколением
+    и видит изменения без поколения в кеше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар', 'перец')
+        ]
+
+    def test_transaction_publishes_once(self):
+        recipe_id = self.recipe.pk
+        generation, = get_generations((RECIPE_INGREDIENTS,))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for ingredient in self.ingredients:
+                RecipeIngredientAmount.objects.create(
+                    recipe=self.recipe, ingredient=ingredient, amount=1
+                )
+            self.recipe.delete()
+        publishes = [
+            callback for callback in callbacks
+            if isinstance(callback, RecipeIngredientChanges)
+        ]
+        self.assertEqual(len(publishes), 1)
+        self.assertEqual(publishes[0].recipe_ids, {recipe_id})
+        self.assertEqual(
+            get_generations((RECIPE_INGREDIENTS,)), [generation + 1]
+        )
+
+    def test_external_changes(self):
+        index = RecipeIngredientIndex()
+        salt, sugar, _ = self.ingredients
+        self.assertEqual(len(index.cover([salt.pk])), 0)
+        RecipeIngredientAmount.objects.bulk_create([
+            RecipeIngredientAmount(
+                recipe=self.recipe, ingredient=salt, amount=1
+            ),
+        ])
+        self.assertEqual(len(index.cover([salt.pk])), 1)
+        RecipeIngredientAmount.objects.filter(ingredient=salt).update(
+            ingredient=sugar
+        )
+        self.assertEqual(len(index.cover([salt.pk])), 0)
+        self.assertEqual(len(index.cover([sugar.pk])), 1)
@@ -0,0 +1,22 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.metrics import registry
+from recipes.models import Tag
+
+
+@override_settings(METRICS_ENABLED=True)
+class SerializationMetricsTest(TestCase):
+
+    def test_serialization_is_timed_per_view(self):
+        Tag.objects.create(name='Завтрак', color='#FFFF00', slug='breakfast')
+        histograms = registry.histograms['foodgram_serialize_duration_seconds']
+        before = {
+            view: histograms[view].count if view in histograms else 0
+            for view in ('tags-list', 'recipes-list')
+        }
+        client = APIClient()
+        self.assertEqual(client.get('/api/tags/').status_code, 200)
+        self.assertEqual(client.get('/api/recipes/').status_code, 200)
+        for view, count in before.items():
+            self.assertEqual(histograms[view].count, count + 1)
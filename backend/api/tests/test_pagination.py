@@ -0,0 +1,47 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        for number in range(3):
+            Recipe.objects.create(
+                author=author,
+                name=f'Суп {number}',
+                text='Рецепт супа.',
+                cooking_time=10,
+                image='recipes/images/soup.jpg',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_mode(self):
+        response = self.client.get(
+            '/api/recipes/?pagination=cursor&limit=2'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_custom_ordering_is_rejected(self):
+        for query in ('ordering=popular', 'search=суп'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f'/api/recipes/?pagination=cursor&{query}'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('pagination', response.json())
+                response = self.client.get(f'/api/recipes/?{query}')
+                self.assertEqual(response.status_code, 200)
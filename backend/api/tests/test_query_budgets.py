@@ -0,0 +1,146 @@
+import difflib
+import re
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.middleware import QueryRecorder, record_queries
+from recipes.feed import rebuild_feeds
+from recipes.models import Cart, FavoriteRecipe, Recipe
+from recipes.shopping import rebuild_shopping_lists
+from users.models import Subscription, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Название, метод, путь и максимальное число SQL-запросов.
+BUDGETS = (
+    ('recipes-list', 'get', '/api/recipes/?limit=100', 8),
+    ('recipes-list-favorited', 'get',
+     '/api/recipes/?limit=100&is_favorited=1', 8),
+    ('recipes-list-in-cart', 'get',
+     '/api/recipes/?limit=100&is_in_shopping_cart=1', 8),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', 8),
+    ('recipes-feed', 'get', '/api/recipes/feed/?limit=100', 8),
+    ('users-list', 'get', '/api/users/?limit=100', 3),
+    ('users-detail', 'get', '/api/users/{author}/', 2),
+    ('users-me', 'get', '/api/users/me/', 1),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?limit=100&recipes_limit=3', 3),
+    ('recipes-favorite-add', 'post', '/api/recipes/{free_recipe}/favorite/',
+     4),
+    ('recipes-favorite-remove', 'delete',
+     '/api/recipes/{free_recipe}/favorite/', 4),
+    ('recipes-shopping-cart-add', 'post',
+     '/api/recipes/{free_recipe}/shopping_cart/', 7),
+    ('recipes-shopping-cart-remove', 'delete',
+     '/api/recipes/{free_recipe}/shopping_cart/', 7),
+    ('recipes-download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/', 1),
+    ('recipes-shopping-cart-summary', 'get',
+     '/api/recipes/shopping_cart_summary/', 2),
+)
+FIXTURES = (
+    ('small', {'users': 3, 'recipes_per_user': 2}),
+    ('large', {'users': 30, 'recipes_per_user': 5}),
+)
+
+
+def normalize(sql):
+    """SQL без конкретных значений, для сравнения запросов."""
+    return re.sub(r'\b\d+\b', '?', sql)
+
+
+# Токен перепроверяется в базе раз в TOKEN_CACHE_LOCAL_TIMEOUT, в бюджет
+# эндпоинтов этот запрос не входит.
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, TOKEN_CACHE_LOCAL_TIMEOUT=60 * 60)
+class QueryBudgetTest(TestCase):
+    """Число SQL-запросов эндпоинтов не зависит от объема данных
+    и укладывается в бюджет."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.actor = User.objects.create(
+            username='query_budget_actor',
+            email='query_budget_actor@example.com',
+            first_name='Бюджет',
+            last_name='Запросов',
+        )
+        self.client = Client(
+            HTTP_AUTHORIZATION=(
+                f'Token {Token.objects.create(user=self.actor)}'
+            )
+        )
+        # Токен попадает в кеш первым запросом и дальше из базы не читается.
+        self.client.get('/api/users/me/')
+
+    def test_budgets(self):
+        measured = {}
+        for fixture, options in FIXTURES:
+            self.seed(options)
+            context = self.get_context()
+            measured[fixture] = {
+                name: self.measure(method, path.format(**context))
+                for name, method, path, _ in BUDGETS
+            }
+        for name, _, _, budget in BUDGETS:
+            small, large = measured['small'][name], measured['large'][name]
+            with self.subTest(name):
+                diff = ''.join(difflib.unified_diff(
+                    [normalize(sql) + '\n' for sql in small],
+                    [normalize(sql) + '\n' for sql in large],
+                    fromfile='small',
+                    tofile='large',
+                ))
+                self.assertEqual(len(small), len(large), diff)
+                self.assertLessEqual(
+                    len(large), budget, '\n'.join(large)
+                )
+
+    def seed(self, options):
+        call_command('seed_benchmark_data', **options, stdout=StringIO())
+        authors = User.objects.exclude(pk=self.actor.pk).exclude(
+            author_in_subscription__user=self.actor
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=self.actor, author=author)
+            for author in authors
+        )
+        rebuild_feeds([self.actor.pk])
+        for model in (FavoriteRecipe, Cart):
+            model.objects.bulk_create(
+                model(user=self.actor, recipe=recipe)
+                for recipe in Recipe.objects.exclude(**{
+                    f'{model._meta.default_related_name}__user': self.actor
+                }).order_by('pk')[1:]
+            )
+        rebuild_shopping_lists([self.actor.pk])
+
+    def get_context(self):
+        free_recipe = Recipe.objects.exclude(
+            favorites__user=self.actor
+        ).exclude(shopping_cart__user=self.actor).first()
+        recipe = Recipe.objects.filter(favorites__user=self.actor).first()
+        return {
+            'recipe': recipe.pk,
+            'author': recipe.author_id,
+            'free_recipe': free_recipe.pk,
+        }
+
+    def measure(self, method, path):
+        recorder = QueryRecorder(keep_sql=True)
+        with record_queries(recorder):
+            response = getattr(self.client, method)(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(
+            response.status_code, 400, f'{method.upper()} {path}'
+        )
+        return [sql for _, sql in recorder.queries]
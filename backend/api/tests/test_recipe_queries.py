@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Cart, FavoriteRecipe, Recipe
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PAGE_SIZES = (6, 50, 100)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark_data',
+            users=10,
+            recipes_per_user=10,
+            stdout=StringIO(),
+        )
+        cls.user = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+            first_name='Читатель',
+            last_name='Рецептов',
+        )
+        recipes = Recipe.objects.order_by('pk')
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=cls.user, recipe=recipe)
+            for recipe in recipes[::2]
+        )
+        Cart.objects.bulk_create(
+            Cart(user=cls.user, recipe=recipe) for recipe in recipes[::3]
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def count_queries(self, client, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/recipes/?limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), limit)
+        return len(queries)
+
+    def assert_constant(self, client):
+        counts = {
+            limit: self.count_queries(client, limit) for limit in PAGE_SIZES
+        }
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_anonymous(self):
+        self.assert_constant(APIClient())
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_constant(client)
+
+    def test_flags(self):
+        cache.clear()
+        favorited = set(
+            self.user.favorites.values_list('recipe_id', flat=True)
+        )
+        in_cart = set(
+            self.user.shopping_cart.values_list('recipe_id', flat=True)
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipes = client.get('/api/recipes/?limit=100').json()['results']
+        recipes += [
+            client.get(f'/api/recipes/{recipe_id}/').json()
+            for recipe_id in (min(favorited), min(in_cart - favorited))
+        ]
+        for recipe in recipes:
+            self.assertEqual(
+                (recipe['is_favorited'], recipe['is_in_shopping_cart']),
+                (recipe['id'] in favorited, recipe['id'] in in_cart),
+            )
+        anonymous = APIClient()
+        recipes = anonymous.get('/api/recipes/?limit=100').json()['results']
+        recipes.append(
+            anonymous.get(f'/api/recipes/{min(favorited)}/').json()
+        )
+        for recipe in recipes:
+            self.assertEqual(
+                (recipe['is_favorited'], recipe['is_in_shopping_cart']),
+                (False, False),
+            )
@@ -0,0 +1,124 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, Ingredient, Recipe, RecipeIngredientAmount,
+                            ShoppingListItem, Tag)
+from users.models import User
+
+
+class RecipeUpdateTest(TestCase):
+    """Обновление рецепта оставляет ровно переданные теги и ингредиенты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            )
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль', 'масло')
+        ]
+        # Без сигналов: обработка несуществующей картинки не нужна.
+        Recipe.objects.bulk_create([Recipe(
+            author=cls.user,
+            name='Пирог',
+            text='Рецепт пирога.',
+            cooking_time=60,
+            image='recipes/images/pie.jpg',
+        )])
+        cls.recipe = Recipe.objects.get()
+        cls.recipe.tags.set(cls.tags[:2])
+        flour, sugar, salt, _ = cls.ingredients
+        for ingredient, amount in ((flour, 100), (sugar, 200), (salt, 300)):
+            RecipeIngredientAmount.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+        Cart.objects.create(user=cls.user, recipe=cls.recipe, servings=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get_state(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        return (
+            set(recipe.tags.values_list('slug', flat=True)),
+            recipe.tags_mask,
+            set(recipe.recipeingredientamount_set.values_list(
+                'ingredient__name', 'amount'
+            )),
+            set(ShoppingListItem.objects.filter(
+                user=self.user, amount__gt=0
+            ).values_list('ingredient__name', 'amount')),
+        )
+
+    def test_update_keeps_changes_and_removes(self):
+        flour, sugar, _, butter = self.ingredients
+        response = self.client.patch(self.url, {
+            'tags': [self.tags[1].pk, self.tags[2].pk],
+            'ingredients': [
+                {'id': flour.pk, 'amount': 100},
+                {'id': sugar.pk, 'amount': 250},
+                {'id': butter.pk, 'amount': 50},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        final = (
+            {'lunch', 'dinner'},
+            self.tags[1].mask | self.tags[2].mask,
+            {('мука', 100), ('сахар', 250), ('масло', 50)},
+            {('мука', 200), ('сахар', 500), ('масло', 100)},
+        )
+        self.assertEqual(self.get_state(), final)
+        self.assertEqual(
+            {
+                (ingredient['name'], ingredient['amount'])
+                for ingredient in response.json()['ingredients']
+            },
+            final[2],
+        )
+        # Обновление без тегов и ингредиентов их не трогает.
+        response = self.client.patch(
+            self.url, {'name': 'Пирог с маслом'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_state(), final)
+
+    def test_update_with_same_set(self):
+        initial = self.get_state()
+        response = self.client.patch(self.url, {
+            'tags': [tag.pk for tag in reversed(self.tags[:2])],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient, amount in zip(
+                    self.ingredients[2::-1], (300, 200, 100)
+                )
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_state(), initial)
+
+    def test_invalid_ingredients_change_nothing(self):
+        initial = self.get_state()
+        flour = self.ingredients[0]
+        for ingredients in (
+            [{'id': flour.pk, 'amount': 1}, {'id': flour.pk, 'amount': 2}],
+            [{'id': flour.pk, 'amount': 1}, {'id': 0, 'amount': 2}],
+        ):
+            response = self.client.patch(
+                self.url, {'ingredients': ingredients}, format='json'
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_state(), initial)
@@ -0,0 +1,123 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, Ingredient, Recipe, RecipeIngredientAmount,
+                            ShoppingListItem)
+from users.models import User
+
+
+class ShoppingCartTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='кг'
+        )
+        RecipeIngredientAmount.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=2
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+
+    def test_patch_requires_servings(self):
+        self.assertEqual(
+            self.client.post(self.url, {'servings': 3}).status_code, 201
+        )
+        response = self.client.patch(self.url, {})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('servings', response.json())
+        self.assertEqual(Cart.objects.get().servings, 3)
+        response = self.client.patch(self.url, {'servings': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.get().servings, 4)
+
+    def test_totals_beyond_integer_range(self):
+        # 3 000 000 кг — больше 2**31 граммов.
+        ShoppingListItem.objects.create(
+            user=self.user, ingredient=self.ingredient, amount=3_000_000
+        )
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(
+            data['ingredients'],
+            [{'name': 'мука', 'measurement_unit': 'г',
+              'amount': 3_000_000_000}],
+        )
+
+    def download(self, shopping_format, content_type):
+        self.client.post(self.url, {'servings': 3})
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/?format={shopping_format}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], content_type)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; '
+            f'filename="Foodgram_Shopping_cart.{shopping_format}"',
+        )
+        return b''.join(response.streaming_content)
+
+    def test_download_txt(self):
+        lines = self.download(
+            'txt', 'text/plain; charset=utf-8'
+        ).decode().splitlines()
+        self.assertTrue(lines[0].startswith('Список покупок для Автор от '))
+        self.assertEqual(
+            lines[2:], ['Потребуются:', '', ' - мука (г) - 6000', '',
+                        'Foodgram.'],
+        )
+
+    def test_download_csv(self):
+        content = self.download('csv', 'text/csv; charset=utf-8').decode()
+        self.assertEqual(
+            content,
+            '\ufeffИнгредиент,Единицы измерения,Количество\r\n'
+            'мука,г,6000\r\n',
+        )
+
+    def test_download_json(self):
+        data = json.loads(
+            self.download('json', 'application/json; charset=utf-8')
+        )
+        self.assertEqual(data['user'], 'author')
+        self.assertEqual(
+            data['ingredients'],
+            [{'name': 'мука', 'measurement_unit': 'г', 'amount': 6000}],
+        )
+
+    def test_download_pdf(self):
+        content = self.download('pdf', 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        # Скобки в строках PDF экранируются.
+        self.assertIn(' - мука \\(г\\) - 6000'.encode('cp1251'), content)
+        # Смещения в таблице xref указывают на начала объектов.
+        xref = content[content.rindex(b'\nxref\n') + 1:].splitlines()
+        size = int(xref[1].split()[1])
+        for number, entry in enumerate(xref[3:size + 2], start=1):
+            offset = int(entry.split()[0])
+            self.assertTrue(
+                content[offset:].startswith(f'{number} 0 obj'.encode())
+            )
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone as tz
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class SubscriptionsRecipesLimitTest(TestCase):
+    """recipes_limit оставляет каждому автору его новые рецепты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, *cls.authors = [
+            User.objects.create(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=username,
+                last_name=username,
+            )
+            for username in ('reader', 'first', 'second')
+        ]
+        now = tz.now()
+        # Порядок id и названий не совпадает с порядком публикации.
+        published = {}
+        for number, author in enumerate(cls.authors):
+            Subscription.objects.create(user=cls.reader, author=author)
+            for days, name in ((3, 'Б'), (1, 'Г'), (4, 'А'), (2, 'В')):
+                published[f'{author.username} {name}'] = (
+                    now - timedelta(days=days, minutes=number)
+                )
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=name,
+                text='Рецепт.',
+                cooking_time=10,
+                image='recipes/images/dish.jpg',
+            )
+            for author in cls.authors
+            for name in published
+            if name.startswith(author.username)
+        ])
+        for name, pub_date in published.items():
+            Recipe.objects.filter(name=name).update(pub_date=pub_date)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get_recipes(self, query=''):
+        response = self.client.get(f'/api/users/subscriptions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return {
+            author['username']: [
+                recipe['name'] for recipe in author['recipes']
+            ]
+            for author in response.json()['results']
+        }
+
+    def test_recipes_limit(self):
+        for limit in (1, 2, 3):
+            self.assertEqual(
+                self.get_recipes(f'?recipes_limit={limit}'),
+                {
+                    author.username: [
+                        f'{author.username} {name}'
+                        for name in ('Г', 'В', 'Б')[:limit]
+                    ]
+                    for author in self.authors
+                },
+            )
+
+    def test_without_limit(self):
+        for query in ('', '?recipes_limit=0', '?recipes_limit=abc'):
+            self.assertEqual(
+                self.get_recipes(query),
+                {
+                    author.username: [
+                        f'{author.username} {name}'
+                        for name in ('Г', 'В', 'Б', 'А')
+                    ]
+                    for author in self.authors
+                },
+            )
@@ -0,0 +1,149 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Ingredient, Recipe, Tag
+from users.models import Subscription, User
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), 'orange').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class RecipeTransferTest(TestCase):
+    """Импорт и экспорт рецептов через API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.follower = [
+            User.objects.create(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=username,
+                last_name=username,
+            )
+            for username in ('author', 'follower')
+        ]
+        Subscription.objects.create(user=cls.follower, author=cls.author)
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        Ingredient.objects.create(name='мука', measurement_unit='г')
+        Ingredient.objects.create(name='молоко', measurement_unit='мл')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def make_record(self, name, tags=('breakfast',)):
+        return {
+            'author': self.author.username,
+            'name': name,
+            'text': f'Рецепт: {name}.',
+            'cooking_time': 20,
+            'tags': list(tags),
+            'ingredients': [
+                {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 500},
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 200},
+            ],
+        }
+
+    def upload(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/recipes/import/', {
+                'file': SimpleUploadedFile(
+                    'recipes.ndjson', '\n'.join(lines).encode()
+                ),
+            })
+
+    def export(self):
+        response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        return [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+
+    def export_without_images(self):
+        records = self.export()
+        for record in records:
+            self.assertTrue(record.pop('image').startswith('data:image/'))
+        return records
+
+    def test_round_trip(self):
+        records = [self.make_record('Блины'), self.make_record('Оладьи')]
+        response = self.upload([
+            json.dumps({**records[0], 'image': make_image()}),
+            '{не json',
+            json.dumps({
+                **self.make_record('Каша', tags=['lunch']),
+                'image': make_image(),
+            }),
+            json.dumps({**records[1], 'image': make_image()}),
+        ])
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (2, 2))
+        self.assertEqual(
+            [(error['line'], list(error['errors']))
+             for error in report['errors']],
+            [(2, ['non_field_errors']), (3, ['tags'])],
+        )
+
+        self.assertEqual(self.export_without_images(), records)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 2)
+        recipes = Recipe.objects.order_by('pk')
+        self.assertEqual(
+            [recipe.tags_mask for recipe in recipes],
+            [Tag.objects.get().mask] * 2,
+        )
+        self.assertTrue(all(recipe.image_variants for recipe in recipes))
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.follower
+            ).values_list('recipe__name', flat=True)),
+            {'Блины', 'Оладьи'},
+        )
+        response = self.client.get('/api/recipes/', {'search': 'блины'})
+        self.assertEqual(
+            [recipe['name'] for recipe in response.json()['results']],
+            ['Блины'],
+        )
+
+        # Выгрузка загружается обратно без ошибок.
+        response = self.upload(
+            json.dumps(record) for record in self.export()
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json(), {'created': 2, 'failed': 0, 'errors': []}
+        )
+        self.assertEqual(self.export_without_images(), records * 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 4)
+
+    @override_settings(RECIPE_IMPORT_MAX_SIZE=1024)
+    def test_upload_size_limit(self):
+        response = self.upload([
+            json.dumps({**self.make_record('Блины'), 'image': make_image()}),
+        ] * 10)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.json())
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,335 @@
+import base64
+import json
+import mimetypes
+import tempfile
+import zipfile
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Ingredient, Recipe, RecipeIngredientAmount, Tag
+from recipes.signals import catalog_changed, recipes_created
+from users.models import User
+
+from .serializers import ImportRecipeSerializer
+
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+ARCHIVE_RECIPES = 'recipes.ndjson'
+
+
+def check_size(size, max_size):
+    if size > max_size:
+        raise ValidationError({
+            'file': 'Файл слишком большой, загрузите его командой '
+                    'import_recipes!'
+        })
+
+
+def open_source(file, max_size=None):
+    """Открывает файл импорта: NDJSON или zip с NDJSON и картинками.
+
+    Возвращает поток строк и архив, из которого берутся картинки,
+    либо None для обычного NDJSON. С max_size ни файл, ни содержимое
+    архива после распаковки не должны быть больше max_size байт.
+    """
+    if max_size is not None:
+        check_size(file.size, max_size)
+    if zipfile.is_zipfile(file):
+        file.seek(0)
+        archive = zipfile.ZipFile(file)
+        if max_size is not None:
+            check_size(
+                sum(info.file_size for info in archive.infolist()), max_size
+            )
+        names = [
+            name for name in archive.namelist()
+            if name.endswith(NDJSON_SUFFIXES)
+        ]
+        if len(names) != 1:
+            raise ValidationError({
+                'file': 'В архиве должен быть один файл .ndjson!'
+            })
+        return archive.open(names[0]), archive
+    file.seek(0)
+    return file, None
+
+
+class RecipeImporter:
+    """Импорт рецептов из NDJSON пакетами по batch_size строк.
+
+    Строки пакета проверяются сериализатором, теги, ингредиенты
+    и авторы находятся одним запросом на пакет, рецепты и связи
+    вставляются через bulk_create в одной транзакции. Ошибки
+    копятся по номерам строк и не прерывают импорт. post_save при этом
+    не отправляется, поэтому для каждого пакета отправляется
+    recipes_created: его получатели обновляют счетчики, копии картинок,
+    поисковый индекс и ленты подписчиков так же, как для одного рецепта.
+    Поколение кеша в конце обновляет catalog_changed.
+    """
+
+    def __init__(self, author=None, archive=None, batch_size=None):
+        self.author = author
+        self.archive = archive
+        self.batch_size = batch_size or settings.RECIPE_TRANSFER_BATCH_SIZE
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, lines):
+        """Импортирует пары (номер строки, строка) и возвращает отчет."""
+        lines = iter(lines)
+        while batch := list(islice(lines, self.batch_size)):
+            resolved = self.resolve(self.validate(batch))
+            if resolved:
+                self.save(resolved)
+        if self.created:
+            catalog_changed.send(sender=Recipe)
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
+
+    def error(self, number, errors):
+        self.failed += 1
+        if len(self.errors) < settings.RECIPE_IMPORT_MAX_ERRORS:
+            self.errors.append({'line': number, 'errors': errors})
+
+    def read_image(self, data):
+        """Заменяет путь к картинке в архиве ее содержимым в base64."""
+        image = data.get('image')
+        if (self.archive is None or not isinstance(image, str)
+                or image.startswith('data:')):
+            return data
+        try:
+            info = self.archive.getinfo(image)
+        except KeyError:
+            raise ValidationError({'image': ['В архиве нет этой картинки!']})
+        if info.file_size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError({'image': ['Картинка слишком большая!']})
+        return {
+            **data,
+            'image': base64.b64encode(self.archive.read(info)).decode(),
+        }
+
+    def validate(self, batch):
+        valid = []
+        for number, line in batch:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                self.error(number, {
+                    'non_field_errors': ['Строка не является объектом JSON!']
+                })
+                continue
+            try:
+                serializer = ImportRecipeSerializer(data=self.read_image(data))
+                serializer.is_valid(raise_exception=True)
+            except ValidationError as error:
+                self.error(number, error.detail)
+                continue
+            valid.append((number, serializer.validated_data))
+        return valid
+
+    def resolve(self, valid):
+        """Находит теги, ингредиенты и авторов для всего пакета сразу."""
+        tags = Tag.objects.in_bulk(
+            {slug for _, data in valid for slug in data['tags']},
+            field_name='slug',
+        )
+        ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in={
+                    ingredient['name']
+                    for _, data in valid
+                    for ingredient in data['ingredients']
+                }
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+        authors = {}
+        if self.author is None:
+            authors = User.objects.in_bulk(
+                {data['author'] for _, data in valid if 'author' in data},
+                field_name='username',
+            )
+        resolved = []
+        for number, data in valid:
+            errors = {}
+            author = self.author or authors.get(data.get('author'))
+            if author is None:
+                errors['author'] = ['Автор не найден!']
+            missing = [slug for slug in data['tags'] if slug not in tags]
+            if missing:
+                errors['tags'] = [f'Нет тегов: {", ".join(missing)}']
+            keys = [
+                (ingredient['name'], ingredient['measurement_unit'])
+                for ingredient in data['ingredients']
+            ]
+            missing = [key for key in keys if key not in ingredients]
+            if missing:
+                errors['ingredients'] = ['Нет ингредиентов: {}'.format(
+                    ', '.join(f'{name} ({unit})' for name, unit in missing)
+                )]
+            if errors:
+                self.error(number, errors)
+                continue
+            resolved.append((
+                number,
+                Recipe(
+                    author=author,
+                    name=data['name'],
+                    text=data['text'],
+                    cooking_time=data['cooking_time'],
+                    tags_mask=sum(tags[slug].mask for slug in data['tags']),
+                ),
+                data['image'],
+                [tags[slug].id for slug in data['tags']],
+                [
+                    (ingredients[key], ingredient['amount'])
+                    for key, ingredient in zip(keys, data['ingredients'])
+                ],
+            ))
+        return resolved
+
+    def save(self, resolved):
+        recipes = [recipe for _, recipe, *_ in resolved]
+        try:
+            with transaction.atomic():
+                for _, recipe, image, *_ in resolved:
+                    recipe.image.save(image.name, image, save=False)
+                Recipe.objects.bulk_create(recipes)
+                self.set_ids(recipes)
+                RecipeIngredientAmount.objects.bulk_create([
+                    RecipeIngredientAmount(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for _, recipe, _, _, ingredients in resolved
+                    for ingredient_id, amount in ingredients
+                ])
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for _, recipe, _, tag_ids, _ in resolved
+                    for tag_id in tag_ids
+                ])
+                recipes_created.send(sender=Recipe, recipes=recipes)
+        except DatabaseError as error:
+            for recipe in recipes:
+                if recipe.image:
+                    recipe.image.storage.delete(recipe.image.name)
+            for number, *_ in resolved:
+                self.error(number, {'non_field_errors': [str(error)]})
+            return
+        self.created += len(recipes)
+
+    def set_ids(self, recipes):
+        """Проставляет id, если база не вернула их из bulk_create.
+
+        Имена файлов картинок уникальны, поэтому рецепты находятся
+        по ним одним запросом.
+        """
+        if all(recipe.pk is not None for recipe in recipes):
+            return
+        ids = dict(Recipe.objects.filter(
+            image__in=[recipe.image.name for recipe in recipes]
+        ).values_list('image', 'id'))
+        for recipe in recipes:
+            recipe.pk = ids[recipe.image.name]
+
+
+def iter_recipes(queryset, batch_size=None):
+    """Рецепты queryset по возрастанию id пачками со связанными данными."""
+    batch_size = batch_size or settings.RECIPE_TRANSFER_BATCH_SIZE
+    queryset = queryset.order_by('pk')
+    last_id = 0
+    while batch := list(queryset.filter(pk__gt=last_id)[:batch_size]):
+        prefetch_related_objects(
+            batch,
+            'author',
+            'tags',
+            Prefetch(
+                'recipeingredientamount_set',
+                queryset=RecipeIngredientAmount.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+        yield from batch
+        last_id = batch[-1].pk
+
+
+def export_record(recipe, image):
+    return {
+        'author': recipe.author.username,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': image,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            }
+            for row in recipe.recipeingredientamount_set.all()
+        ],
+    }
+
+
+def dump_record(record):
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def image_to_data_uri(image):
+    content_type = mimetypes.guess_type(image.name)[0] or 'image/jpeg'
+    try:
+        with image.storage.open(image.name) as file:
+            content = base64.b64encode(file.read()).decode()
+    except OSError:
+        return None
+    return f'data:{content_type};base64,{content}'
+
+
+def stream_ndjson(queryset):
+    """Построчный NDJSON с картинками в base64."""
+    for recipe in iter_recipes(queryset):
+        yield dump_record(
+            export_record(recipe, image_to_data_uri(recipe.image))
+        )
+
+
+def write_zip(queryset, file):
+    """Пишет архив с recipes.ndjson и файлами картинок.
+
+    Строки копятся во временном файле, который попадает в архив
+    последним, а каждая картинка записывается один раз.
+    """
+    with zipfile.ZipFile(file, 'w') as archive, \
+            tempfile.SpooledTemporaryFile() as lines:
+        written = {}
+        for recipe in iter_recipes(queryset):
+            name = recipe.image.name
+            if name not in written:
+                try:
+                    with recipe.image.storage.open(name) as image:
+                        archive.writestr(name, image.read())
+                    written[name] = name
+                except OSError:
+                    written[name] = None
+            lines.write(
+                dump_record(export_record(recipe, written[name])).encode()
+            )
+        lines.seek(0)
+        with archive.open(ARCHIVE_RECIPES, 'w') as target:
+            while chunk := lines.read(1024 * 1024):
+                target.write(chunk)
@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api.views import (CustomUserViewSet, IngredientViewSet, MetricsView,
+                       RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
@@ -14,6 +14,7 @@ router_v1.register('users', CustomUserViewSet, 'users')
 
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
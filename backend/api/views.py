@@ -1,33 +1,60 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone as tz
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from recipes.models import (Cart, FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredientAmount, Tag)
+from core.metrics import (SerializationMetricsMixin, registry,
+                          render_gauges)
+from recipes.feed import get_feed, get_feed_recipes
+from recipes.models import Cart, FavoriteRecipe, Ingredient, Recipe, Tag
+from recipes.shopping import set_servings
 from users.models import Subscription, User
 
+from .authentication import token_cache
+from .cache import AnonymousCacheMixin, cache_stats
+from .conditional import ConditionalGetMixin, RecipeConditionalGetMixin
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CartPagination, CustomPagination
+from .indexes import ingredient_index, recipe_index
+from .loaders import (get_recipes_limit, load_recipes, load_subscriptions,
+                      load_users)
+from .pagination import (CustomPagination, FeedCursorPagination,
+                         OptionalCursorPagination,
+                         UserOptionalCursorPagination)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (CustomUserSerializer, IndexSerializer,
+from .renderers import SHOPPING_LIST_RENDERERS
+from .serializers import (CartServingsSerializer,
+                          CartServingsUpdateSerializer,
+                          CoverageQuerySerializer, CoverageRecipeSerializer,
+                          CustomUserSerializer, IndexSerializer,
                           IngredientSerializer, ReadRecipeSerializer,
-                          SubscriptionSerializer, TagSerializer,
-                          WriteRecipeSerializer)
+                          ShoppingListItemSerializer, SubscriptionSerializer,
+                          TagSerializer, WriteRecipeSerializer)
+from .shopping_list import SHOPPING_LIST_STREAMS, get_shopping_list
+from .transfer import RecipeImporter, open_source, stream_ndjson
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializationMetricsMixin, UserViewSet):
     """Кастомный вьюсет джосер"""
+    read_replica = True
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = UserOptionalCursorPagination
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None or self.action != 'list':
+            return page
+        return load_users(page, self.request.user)
 
     @action(
         methods=['post', 'delete'],
@@ -43,6 +70,7 @@ class CustomUserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             Subscription.objects.create(user=request.user, author=author)
+            load_subscriptions([author], get_recipes_limit(request))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             subscription = get_object_or_404(
@@ -60,46 +88,93 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         subscriptions = User.objects.filter(author_in_subscription__user=user)
         serializer_context = {"request": request}
-        paginated_subscriptions = self.paginate_queryset(subscriptions)
+        paginated_subscriptions = load_subscriptions(
+            self.paginate_queryset(subscriptions),
+            get_recipes_limit(request),
+        )
 
         serializer = SubscriptionSerializer(
             paginated_subscriptions,
             many=True,
             context=serializer_context)
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(
+            self.get_serialized_data(serializer)
+        )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                        SerializationMetricsMixin, ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
 
+    read_replica = True
+    namespaces = ('ingredients',)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.get_conditional_response(self.search, request)
+
+    def search(self, request):
+        name = request.query_params['name']
+        try:
+            limit = int(request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        return Response(ingredient_index.search(
+            name, min(max(limit, 1), settings.INGREDIENT_SEARCH_LIMIT)
+        ))
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                 SerializationMetricsMixin, ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
 
+    read_replica = True
+    namespaces = ('tags',)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(RecipeConditionalGetMixin, AnonymousCacheMixin,
+                    SerializationMetricsMixin, ModelViewSet):
     """Вьюсет для отображения рецептов
     на главной странице, в корзине и в избранном."""
 
+    read_replica = True
+    namespaces = ('recipes', 'tags', 'ingredients')
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
-    pagination_class = CustomPagination
+    pagination_class = OptionalCursorPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_namespaces(self, request):
+        # Счетчики избранного обновляются без сохранения рецепта.
+        if (self.action == 'list'
+                and request.query_params.get('ordering') == 'popular'):
+            return self.namespaces + ('favorites',)
+        return self.namespaces
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            return None
+        return load_recipes(page, self.request.user)
+
+    def get_object(self):
+        recipe = super().get_object()
+        load_recipes([recipe], self.request.user)
+        return recipe
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return ReadRecipeSerializer
@@ -138,12 +213,25 @@ class RecipeViewSet(ModelViewSet):
             )
 
     @action(
-        methods=['post', 'delete'],
+        methods=['post', 'patch', 'delete'],
         detail=True,
         permission_classes=[IsAuthenticated],)
     def shopping_cart(self, request, pk):
-        self.queryset = Cart.objects.all().order_by('-id',)
-        self.pagination_class = CartPagination
+        if request.method in ('POST', 'PATCH'):
+            serializer_class = (
+                CartServingsUpdateSerializer
+                if request.method == 'PATCH' else CartServingsSerializer
+            )
+            params = serializer_class(data=request.data)
+            params.is_valid(raise_exception=True)
+            servings = params.validated_data['servings']
+        if request.method == 'PATCH':
+            if not set_servings(request.user.id, pk, servings):
+                return Response(
+                    {"errors": "Этого рецепта нет в корзине!"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response(params.data)
         if request.method == 'POST':
             recipe = get_object_or_404(Recipe, id=pk)
             if Cart.objects.filter(
@@ -156,7 +244,8 @@ class RecipeViewSet(ModelViewSet):
                 )
             Cart.objects.create(
                 user=self.request.user,
-                recipe=recipe)
+                recipe=recipe,
+                servings=servings)
             serializer = IndexSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
@@ -171,41 +260,143 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    def cart_text(self, user, ingredients, date):
-        text = (
-            f'Список покупок для {user.first_name}!\n\n'
-            'Потребуются:\n\n'
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
+    def download_shopping_cart(self, request):
+        renderer = request.accepted_renderer
+        stream = SHOPPING_LIST_STREAMS[renderer.format]
+        response = StreamingHttpResponse(
+            stream(request.user, tz.localtime()),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
+            ),
         )
-        text += '\n'.join([
-            f' - {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["in_shopping_cart_ingredient_amount"]}'
-            for ingredient in ingredients
-        ])
-        text += '\n\nFoodgram.'
-        return text
+        response['Content-Disposition'] = (
+            'attachment; '
+            f'filename="Foodgram_Shopping_cart.{renderer.format}"'
+        )
+        return response
 
     @action(detail=False,
             methods=['get'],
             permission_classes=[IsAuthenticated])
-    def download_shopping_cart(self, request):
-        self.queryset = Cart.objects.all().order_by('-id',)
-        self.pagination_class = CartPagination
-        ingredients = RecipeIngredientAmount.objects.filter(
-            recipe__shopping_cart__user=self.request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            in_shopping_cart_ingredient_amount=Sum('amount')
-        ).order_by('ingredient__name')
-        shopping_list_date = tz.now()
-        cart_text = self.cart_text(
-            self.request.user, ingredients, shopping_list_date
-        )
-
-        response = HttpResponse(cart_text, content_type='text/plain')
+    def shopping_cart_summary(self, request):
+        return Response({
+            'recipes': Cart.objects.filter(user=request.user).count(),
+            'ingredients': ShoppingListItemSerializer(
+                get_shopping_list(request.user), many=True
+            ).data,
+        })
+
+    @action(detail=False,
+            methods=['get'],
+            pagination_class=CustomPagination)
+    def what_to_cook(self, request):
+        query = CoverageQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        found = self.paginator.paginate_queryset(
+            recipe_index.cover(
+                query.validated_data['ingredients'],
+                query.validated_data['exclude'],
+                query.validated_data['min_coverage'],
+            ),
+            request,
+            view=self,
+        )
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for *_, recipe_id in found]
+        )
+        page = []
+        for coverage, _, missing_count, recipe_id in found:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = coverage
+                recipe.missing_count = missing_count
+                page.append(recipe)
+        serializer = CoverageRecipeSerializer(
+            load_recipes(page, request.user),
+            many=True,
+            context={'request': request},
+        )
+        return self.get_paginated_response(
+            self.get_serialized_data(serializer)
+        )
+
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedCursorPagination)
+    def feed(self, request):
+        page = self.paginator.paginate_queryset(
+            get_feed(request.user), request, view=self
+        )
+        serializer = ReadRecipeSerializer(
+            load_recipes(get_feed_recipes(page), request.user),
+            many=True,
+            context={'request': request},
+        )
+        return self.get_paginated_response(
+            self.get_serialized_data(serializer)
+        )
+
+    @action(detail=False,
+            methods=['post'],
+            url_path='import',
+            permission_classes=[IsAuthenticated],
+            parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        file = request.FILES.get('file')
+        if file is None:
+            return Response(
+                {'file': 'Загрузите файл .ndjson или .zip!'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines, archive = open_source(
+            file, max_size=settings.RECIPE_IMPORT_MAX_SIZE
+        )
+        report = RecipeImporter(
+            author=request.user, archive=archive
+        ).run(enumerate(lines, 1))
+        return Response(
+            report,
+            status=(
+                status.HTTP_201_CREATED if report['created']
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated])
+    def export(self, request):
+        response = StreamingHttpResponse(
+            stream_ndjson(self.filter_queryset(self.get_queryset())),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="Foodgram_Shopping_cart.txt"'
+            'attachment; filename="Foodgram_recipes.ndjson"'
         )
         return response
+
+
+class MetricsView(APIView):
+    """Метрики запросов в текстовом формате Prometheus."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render() + render_gauges(
+                'foodgram_response_cache',
+                'Попадания и промахи кеша ответов API.',
+                cache_stats(),
+            ) + render_gauges(
+                'foodgram_token_cache',
+                'Попадания и промахи кеша токенов в процессе.',
+                token_cache.hit_stats(),
+            ),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
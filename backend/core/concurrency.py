@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .middleware import active_recorders, record_queries
+
+executor = (
+    ThreadPoolExecutor(
+        max_workers=settings.QUERY_WORKERS,
+        thread_name_prefix='foodgram-query',
+    )
+    if settings.QUERY_WORKERS else None
+)
+
+
+def run_query(func, *args):
+    """Выполняет func в потоке пула со счетчиками запросов вызывающего.
+
+    Соединения потока закрываются по правилам CONN_MAX_AGE, как
+    в конце обычного запроса.
+    """
+    try:
+        with ExitStack() as stack:
+            for recorder in active_recorders.get():
+                stack.enter_context(record_queries(recorder))
+            return func(*args)
+    finally:
+        close_old_connections()
+
+
+def in_transaction():
+    return any(
+        connection.in_atomic_block for connection in connections.all()
+    )
+
+
+def run_concurrently(*calls):
+    """Выполняет независимые вызовы (func, *args) одновременно.
+
+    Первый вызов выполняется в текущем потоке, остальные в пуле
+    из QUERY_WORKERS потоков с копией контекста (contextvars).
+    Возвращает результаты в порядке вызовов. Внутри транзакции
+    вызовы выполняются по очереди: другие соединения не видят
+    ее незафиксированных изменений.
+    """
+    if executor is None or len(calls) < 2 or in_transaction():
+        return [func(*args) for func, *args in calls]
+    futures = [
+        executor.submit(copy_context().run, run_query, func, *args)
+        for func, *args in calls[1:]
+    ]
+    func, *args = calls[0]
+    return [func(*args)] + [future.result() for future in futures]
+
+
+class ThreadPerRequestMiddleware:
+    """ASGI-обертка: синхронный код каждого HTTP-запроса в своем потоке.
+
+    Django 3.2 под ASGI выполняет синхронные вью в одном потоке на
+    процесс, поэтому запросы обрабатываются по очереди. Обертка
+    запускает каждый запрос в ThreadSensitiveContext со своим потоком,
+    а семафор ограничивает число одновременно обрабатываемых запросов
+    и открытых соединений с базой значением ASGI_THREADS. Поток
+    завершается вместе с запросом, поэтому его соединения закрываются
+    в нем же независимо от CONN_MAX_AGE, иначе они остались бы открытыми
+    без владельца.
+    """
+
+    def __init__(self, application, max_threads):
+        self.application = application
+        self.max_threads = max_threads
+        self.semaphore = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_threads)
+        async with self.semaphore:
+            async with ThreadSensitiveContext():
+                try:
+                    return await self.application(scope, receive, send)
+                finally:
+                    await sync_to_async(connections.close_all)()
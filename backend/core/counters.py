@@ -0,0 +1,13 @@
+from django.db.models import F
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет денормализованный счетчик на delta.
+
+    Счетчик не уходит ниже нуля, даже если разошелся с данными;
+    такие расхождения исправляет команда recount_counters.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
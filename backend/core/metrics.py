@@ -0,0 +1,153 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from rest_framework.response import Response
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами в формате Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield f'{bound:g}', total
+        yield '+Inf', self.count
+
+
+class Registry:
+    """Гистограммы метрик по вью в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.histograms = defaultdict(dict)
+
+    def register(self, name, description, buckets):
+        self.metrics[name] = (description, buckets)
+
+    def observe(self, name, view, value):
+        with self.lock:
+            histogram = self.histograms[name].get(view)
+            if histogram is None:
+                histogram = self.histograms[name][view] = Histogram(
+                    self.metrics[name][1]
+                )
+            histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (description, _) in self.metrics.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{count}'
+                        )
+                    lines.append(
+                        f'{name}_sum{{view="{view}"}} {histogram.sum:g}'
+                    )
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {histogram.count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+class SerializationMetricsMixin:
+    """Замеряет время сериализации (serializer.data) списков и объектов.
+
+    Время копится в атрибуте serialize_duration запроса Django,
+    MetricsMiddleware записывает его отдельной гистограммой.
+    """
+
+    def get_serialized_data(self, serializer):
+        start = time.perf_counter()
+        data = serializer.data
+        request = self.request._request
+        request.serialize_duration = (
+            getattr(request, 'serialize_duration', 0)
+            + time.perf_counter() - start
+        )
+        return data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serialized_data(
+                self.get_serializer(page, many=True)
+            ))
+        return Response(self.get_serialized_data(
+            self.get_serializer(queryset, many=True)
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serialized_data(
+            self.get_serializer(self.get_object())
+        ))
+
+
+def render_gauges(name, description, values):
+    """Текст метрик-gauge для словаря метка -> значение."""
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} gauge']
+    lines.extend(
+        f'{name}{{kind="{kind}"}} {value:g}' for kind, value in values.items()
+    )
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+registry.register(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    DURATION_BUCKETS,
+)
+registry.register(
+    'foodgram_sql_queries',
+    'Количество SQL-запросов на запрос.',
+    QUERY_BUCKETS,
+)
+registry.register(
+    'foodgram_sql_duration_seconds',
+    'Суммарное время SQL-запросов.',
+    DURATION_BUCKETS,
+)
+registry.register(
+    'foodgram_serialize_duration_seconds',
+    'Время сериализации данных ответа.',
+    DURATION_BUCKETS,
+)
+registry.register(
+    'foodgram_render_duration_seconds',
+    'Время рендеринга ответа.',
+    DURATION_BUCKETS,
+)
+registry.register(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа.',
+    SIZE_BUCKETS,
+)
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import registry
+from .routers import (choose_replica, is_sticky, read_database,
+                      stick_to_primary)
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+# Счетчики, подключенные в текущем контексте: запросы из потоков
+# core.concurrency учитываются в них же.
+active_recorders = ContextVar('active_recorders', default=())
+
+
+class QueryRecorder:
+    """Обертка connection.execute_wrapper, считающая SQL-запросы."""
+
+    def __init__(self, keep_sql):
+        self.keep_sql = keep_sql
+        self.count = 0
+        self.duration = 0
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.duration += duration
+                if self.keep_sql:
+                    self.queries.append((duration, sql))
+
+
+@contextmanager
+def record_queries(recorder):
+    """Подключает recorder ко всем соединениям с базами данных."""
+    previous = active_recorders.get()
+    active_recorders.set(previous + (recorder,))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield
+    finally:
+        active_recorders.set(previous)
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов по вью, включается METRICS_ENABLED.
+
+    Для каждого вью (recipes-list, users-subscriptions и т. п.)
+    записывает время обработки, число и время SQL-запросов, время
+    сериализации и рендеринга и размер ответа. Запросы дольше
+    METRICS_SLOW_REQUEST_SECONDS пишутся в лог вместе с самыми
+    медленными SQL-запросами.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request = settings.METRICS_SLOW_REQUEST_SECONDS
+
+    def __call__(self, request):
+        recorder = QueryRecorder(keep_sql=self.slow_request is not None)
+        start = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, recorder, start
+            )
+        else:
+            self.observe(request, recorder, start, len(response.content))
+        return response
+
+    def stream(self, content, request, recorder, start):
+        """Учитывает запросы и размер ответа, пока он отдается потоком."""
+        size = 0
+        try:
+            with record_queries(recorder):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.observe(request, recorder, start, size)
+
+    def observe(self, request, recorder, start, size):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        registry.observe('foodgram_request_duration_seconds', view, duration)
+        registry.observe('foodgram_sql_queries', view, recorder.count)
+        registry.observe('foodgram_sql_duration_seconds', view,
+                         recorder.duration)
+        registry.observe('foodgram_response_size_bytes', view, size)
+        if hasattr(request, 'serialize_duration'):
+            registry.observe('foodgram_serialize_duration_seconds', view,
+                             request.serialize_duration)
+        if hasattr(request, 'render_duration'):
+            registry.observe('foodgram_render_duration_seconds', view,
+                             request.render_duration)
+        if self.slow_request is not None and duration > self.slow_request:
+            self.log_slow_request(request, view, duration, recorder)
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.render_duration = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow_request(self, request, view, duration, recorder):
+        slowest = sorted(recorder.queries, reverse=True)[
+            :settings.METRICS_SLOW_REQUEST_QUERIES
+        ]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.3f с, SQL: %d запросов '
+            'за %.3f с\n%s',
+            request.method,
+            request.get_full_path(),
+            view,
+            duration,
+            recorder.count,
+            recorder.duration,
+            '\n'.join(
+                f'[{elapsed:.3f} с] {sql}' for elapsed, sql in slowest
+            ),
+        )
+
+
+class ReadReplicaMiddleware:
+    """Направляет чтения безопасных запросов к репликам.
+
+    Включается, если заданы DATABASE_REPLICAS. Реплика выбирается для
+    GET, HEAD и OPTIONS к вью с атрибутом read_replica = True. Клиент,
+    который недавно что-то изменил, REPLICA_STICKY_SECONDS читает из
+    основной базы, как и запрос с заголовком REPLICA_PIN_HEADER.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.set(None)
+        if request.method not in SAFE_METHODS:
+            stick_to_primary(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method not in SAFE_METHODS
+                or not getattr(
+                    getattr(view_func, 'cls', None), 'read_replica', False
+                )
+                or request.META.get(settings.REPLICA_PIN_HEADER)):
+            return
+        if not is_sticky(request):
+            read_database.set(choose_replica())
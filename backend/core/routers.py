@@ -0,0 +1,81 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_SALT = 'foodgram.primary'
+# Токены и сессии читаются из основной базы: только что выданный
+# токен может еще не дойти до реплики.
+PRIMARY_APPS = {'authtoken', 'sessions'}
+
+# Реплика для чтения в текущем запросе, None — основная база.
+read_database = ContextVar('read_database', default=None)
+
+
+def choose_replica():
+    """Реплика из DATABASE_REPLICAS с учетом весов."""
+    aliases = list(settings.DATABASE_REPLICAS)
+    return random.choices(
+        aliases, weights=[settings.DATABASE_REPLICAS[a] for a in aliases]
+    )[0]
+
+
+def stick_to_primary(response):
+    """Читать из основной базы REPLICA_STICKY_SECONDS после записи.
+
+    Так клиент сразу видит свои изменения, даже если реплика
+    отстает. Метка хранится в подписанной cookie, а не в кеше, поэтому
+    ее видят все воркеры; срок проверяется по подписи.
+    """
+    response.set_signed_cookie(
+        settings.REPLICA_STICKY_COOKIE,
+        '1',
+        salt=STICKY_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def is_sticky(request):
+    return request.get_signed_cookie(
+        settings.REPLICA_STICKY_COOKIE,
+        default=None,
+        salt=STICKY_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS,
+    ) is not None
+
+
+@contextmanager
+def use_primary():
+    """Чтения внутри блока идут в основную базу."""
+    previous = read_database.get()
+    read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.set(previous)
+
+
+class ReplicaRouter:
+    """Чтения запроса — из выбранной middleware реплики, записи — в default.
+
+    Реплики не мигрируются: схему и данные они получают репликацией
+    из основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
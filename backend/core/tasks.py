@@ -0,0 +1,40 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = (
+    ThreadPoolExecutor(
+        max_workers=settings.BACKGROUND_WORKERS,
+        thread_name_prefix='foodgram-background',
+    )
+    if settings.BACKGROUND_WORKERS else None
+)
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой', func)
+    finally:
+        if executor is not None:
+            connections.close_all()
+
+
+def run_in_background(func, *args):
+    """Запускает func вне потока запроса после коммита транзакции.
+
+    При BACKGROUND_WORKERS = 0 задача выполняется сразу после коммита
+    в текущем потоке, что удобно для тестов и management-команд.
+    """
+    def submit():
+        if executor is None:
+            run_task(func, *args)
+        else:
+            executor.submit(run_task, func, *args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import TestCase
+
+from ..concurrency import ThreadPerRequestMiddleware
+
+
+class ThreadPerRequestMiddlewareTest(TestCase):
+    """Соединения потока запроса закрываются вместе с запросом."""
+
+    def test_request_thread_connections_are_closed(self):
+        opened, closed = [], []
+
+        def query():
+            wrapper = connections['default']
+            wrapper.ensure_connection()
+            opened.append((threading.get_ident(), wrapper))
+
+        def close(wrapper):
+            closed.append((threading.get_ident(), wrapper))
+
+        async def application(scope, receive, send):
+            await sync_to_async(query)()
+
+        middleware = ThreadPerRequestMiddleware(application, 2)
+        # Django не закрывает тестовую базу SQLite в памяти, поэтому
+        # проверяется сам вызов close.
+        wrapper_class = type(connections['default'])
+        with mock.patch.object(
+            wrapper_class, 'close', autospec=True, side_effect=close
+        ):
+            asyncio.run(middleware({'type': 'http'}, None, None))
+        (thread, request_connection), = opened
+        self.assertNotEqual(thread, threading.get_ident())
+        self.assertIn((thread, request_connection), closed)
@@ -0,0 +1,102 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.cache import bump_generation
+from recipes.models import Recipe
+from users.models import User
+
+REPLICA = next(iter(settings.DATABASE_REPLICAS), None)
+
+
+@skipUnless(REPLICA, 'Нужны реплики: DB_REPLICAS=replica.sqlite3.')
+class ReplicaRouterTest(TransactionTestCase):
+    """Чтения идут в реплику, после записи клиент читает из основной
+    базы, в том числе в другом воркере.
+
+    Реплика в тестах — отдельное соединение с той же базой (TEST
+    MIRROR), поэтому данные фиксируются, как при настоящей репликации.
+    """
+
+    databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        # Без сигналов: обработка несуществующей картинки не нужна.
+        Recipe.objects.bulk_create([Recipe(
+            author=self.author,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )])
+        self.recipe = Recipe.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def read(self, client):
+        """Число запросов чтения рецепта к основной базе и к реплике."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        primary, replica = self.read(self.client)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/', HTTP_X_READ_PRIMARY='1'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_sticks_to_primary_after_write(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(
+            cookie['max-age'], settings.REPLICA_STICKY_SECONDS
+        )
+        # Другой воркер не делит с этим ни память, ни кеш: метку он
+        # узнает только из cookie.
+        other = APIClient()
+        other.force_authenticate(self.author)
+        other.cookies[settings.REPLICA_STICKY_COOKIE] = cookie.value
+        primary, replica = self.read(other)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_forged_cookie_is_ignored(self):
+        self.client.cookies[settings.REPLICA_STICKY_COOKIE] = '1'
+        primary, replica = self.read(self.client)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_anonymous_cache_miss_reads_replica(self):
+        # Данные не менялись дольше REPLICA_STICKY_SECONDS.
+        cache.clear()
+        anonymous = APIClient()
+        primary, replica = self.read(anonymous)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        _, validators = self.read(anonymous)
+        # Реплика могла еще не получить изменение: ответ строится
+        # по основной базе, на реплике остаются запросы для ETag,
+        # как при попадании в кеш.
+        bump_generation('recipes')
+        primary, replica = self.read(anonymous)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, validators)
@@ -4,4 +4,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from core.concurrency import ThreadPerRequestMiddleware  # noqa: E402
+
+application = ThreadPerRequestMiddleware(
+    django_application, settings.ASGI_THREADS
+)
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +50,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -65,6 +67,26 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+
+METRICS_SLOW_REQUEST_SECONDS = (
+    float(os.getenv('METRICS_SLOW_REQUEST_SECONDS'))
+    if os.getenv('METRICS_SLOW_REQUEST_SECONDS') else None
+)
+
+METRICS_SLOW_REQUEST_QUERIES = 10
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -93,10 +115,34 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'django'),
         'HOST': 'db',
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 0)),
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=host1=3,host2 — хосты (для SQLite —
+# файлы баз) с весами, по умолчанию 1.
+DATABASE_REPLICAS = {}
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    location, _, weight = replica.partition('=')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if 'sqlite3' in str(DATABASES['default']['ENGINE']):
+        DATABASES[alias]['NAME'] = location
+    else:
+        DATABASES[alias]['HOST'] = location
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_COOKIE = 'read_primary'
+REPLICA_PIN_HEADER = 'HTTP_X_READ_PRIMARY'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -141,6 +187,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MAX_EMAEL_LENGHT = 254
 MAX_USER_LENGHT = 100
 MAX_TAG_COLOR_LENGHT = 7
+MAX_TAGS = 63
 MAX_NAME_SLUG_MEASUREMENT_UNIT_LENGHT = 200
 MIN_TEXT_LENGHT = 2
 MIN_HEX_LENGHT = 4
@@ -149,5 +196,31 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 1000
 MIN_AMOUNT = 1
 MAX_AMOUNT = 10000
+MIN_SERVINGS = 1
+MAX_SERVINGS = 100
 LIMIT_PAG = 100
 LIMIT_PAG_SIZE = 6
+INGREDIENT_SEARCH_LIMIT = 50
+INDEX_CHECK_SECONDS = 30
+INGREDIENT_INDEX_MAX_AGE = 5 * 60
+RECIPE_INDEX_CHUNK_SIZE = 5000
+RECIPE_INDEX_MAX_CHANGES = 1000
+RECIPE_INDEX_CHANGES_TIMEOUT = 60 * 60
+SHOPPING_LIST_CHUNK_SIZE = 2000
+RECIPE_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 6000
+RECIPE_IMAGE_STORED_SIZE = 2048
+RECIPE_IMAGE_VARIANTS = {'card': 480, 'detail': 1200}
+RECIPE_IMAGE_WEBP = True
+RECIPE_TRANSFER_BATCH_SIZE = 100
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+RECIPE_IMPORT_MAX_ERRORS = 100
+RECIPE_IMPORT_MAX_SIZE = 50 * 1024 * 1024
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 50
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_LOCAL_TIMEOUT = 10
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', 0))
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
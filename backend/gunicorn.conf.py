@@ -0,0 +1,11 @@
+import os
+
+# wsgi — синхронные воркеры, asgi — воркеры uvicorn.
+interface = os.getenv('SERVER_INTERFACE', 'wsgi')
+
+wsgi_app = f'foodgram.{interface}:application'
+bind = os.getenv('SERVER_BIND', '0.0.0.0:8030')
+workers = int(os.getenv('SERVER_WORKERS', 1))
+worker_class = (
+    'uvicorn.workers.UvicornWorker' if interface == 'asgi' else 'sync'
+)
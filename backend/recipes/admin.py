@@ -17,6 +17,7 @@ class CartAdmin(admin.ModelAdmin):
     list_display = (
         'user',
         'recipe',
+        'servings',
         'get_ingredients',
         'add_to_shopping_cart_date',
     )
@@ -101,7 +102,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Кол-во добавлений')
     def in_favorite_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(RecipeIngredientAmount)
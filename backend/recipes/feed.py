@@ -0,0 +1,209 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from users.models import Subscription, User
+
+from .models import FeedEntry, Recipe
+
+
+def get_fanned_out_subscriptions():
+    """Подписки на авторов, рецепты которых раскладываются по лентам.
+
+    У авторов с числом подписчиков больше FEED_FANOUT_MAX_FOLLOWERS
+    запись в ленты каждого подписчика слишком дорогая, их рецепты
+    добавляются в ленту при чтении.
+    """
+    return Subscription.objects.filter(
+        author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    )
+
+
+def create_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_recipes(recipe_ids):
+    """Раскладывает новые рецепты по лентам подписчиков авторов.
+
+    Подписчики читаются пачками по FEED_BATCH_SIZE, записи ленты
+    вставляются через bulk_create.
+    """
+    recipes = defaultdict(list)
+    for recipe_id, author_id, pub_date in Recipe.objects.filter(
+        pk__in=recipe_ids,
+        author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('id', 'author_id', 'pub_date'):
+        recipes[author_id].append((recipe_id, pub_date))
+    for author_id, author_recipes in recipes.items():
+        followers = Subscription.objects.filter(
+            author_id=author_id
+        ).order_by('pk')
+        last_id = 0
+        while batch := list(
+            followers.filter(pk__gt=last_id).values_list(
+                'pk', 'user_id'
+            )[:settings.FEED_BATCH_SIZE]
+        ):
+            create_entries(
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for _, user_id in batch
+                for recipe_id, pub_date in author_recipes
+            )
+            last_id = batch[-1][0]
+
+
+def fill_feeds(subscriptions):
+    """Добавляет последние рецепты авторов в ленты подписчиков.
+
+    subscriptions — пары (user_id, author_id). Последние
+    FEED_BACKFILL_SIZE рецептов всех авторов выбираются одним
+    запросом с коррелированным подзапросом.
+    """
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return
+    recipes = defaultdict(list)
+    for recipe_id, author_id, pub_date in Recipe.objects.filter(
+        author_id__in={author_id for _, author_id in subscriptions},
+        pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-pub_date', '-id').values(
+                'pk'
+            )[:settings.FEED_BACKFILL_SIZE]
+        ),
+    ).values_list('id', 'author_id', 'pub_date'):
+        recipes[author_id].append((recipe_id, pub_date))
+    create_entries(
+        FeedEntry(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id, author_id in subscriptions
+        for recipe_id, pub_date in recipes[author_id]
+    )
+
+
+def is_fanned_out(author_id):
+    return User.objects.filter(
+        pk=author_id,
+        followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет рецепты автора в ленту нового подписчика.
+
+    Подписка проверяется заново: к запуску задачи пользователь
+    мог уже отписаться. Если с этой подпиской у автора стало больше
+    FEED_FANOUT_MAX_FOLLOWERS подписчиков, его рецепты убираются
+    из всех лент: дальше они подмешиваются при чтении, а оставшиеся
+    записи разошлись бы с рецептами, опубликованными после перехода.
+    """
+    if not is_fanned_out(author_id):
+        FeedEntry.objects.filter(author_id=author_id).delete()
+        return
+    fill_feeds(
+        get_fanned_out_subscriptions().filter(
+            user_id=user_id,
+            author_id=author_id,
+        ).values_list('user_id', 'author_id')
+    )
+
+
+def backfill_author_feeds(author_id):
+    """Добавляет рецепты автора в ленты подписчиков, где их нет.
+
+    Нужна, когда после отписки у автора снова не больше
+    FEED_FANOUT_MAX_FOLLOWERS подписчиков: пока их было больше,
+    рецепты в ленты не раскладывались. Подписчики без записей автора
+    выбираются пачками по FEED_BATCH_SIZE; у небольших авторов их
+    обычно нет, и задача ограничивается одним запросом.
+    """
+    if not (is_fanned_out(author_id)
+            and Recipe.objects.filter(author_id=author_id).exists()):
+        return
+    subscriptions = Subscription.objects.filter(
+        ~Exists(
+            FeedEntry.objects.filter(
+                author_id=author_id, user_id=OuterRef('user_id')
+            )
+        ),
+        author_id=author_id,
+    ).order_by('pk')
+    last_id = 0
+    while batch := list(
+        subscriptions.filter(pk__gt=last_id).values_list(
+            'pk', 'user_id', 'author_id'
+        )[:settings.FEED_BATCH_SIZE]
+    ):
+        fill_feeds((user_id, author_id) for _, user_id, author_id in batch)
+        last_id = batch[-1][0]
+
+
+def trim_feed(user_id, author_id):
+    """Убирает рецепты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feeds(user_ids=None):
+    """Пересобирает ленты пользователей из подписок.
+
+    Без user_ids пересобираются все ленты. Подписки читаются
+    пачками по FEED_BATCH_SIZE.
+    """
+    entries = FeedEntry.objects.all()
+    subscriptions = get_fanned_out_subscriptions().order_by('pk')
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+    entries.delete()
+    last_id = 0
+    while batch := list(
+        subscriptions.filter(pk__gt=last_id).values_list(
+            'pk', 'user_id', 'author_id'
+        )[:settings.FEED_BATCH_SIZE]
+    ):
+        fill_feeds((user_id, author_id) for _, user_id, author_id in batch)
+        last_id = batch[-1][0]
+
+
+def get_feed(user):
+    """Лента подписок пользователя от новых рецептов к старым.
+
+    Обычно это записи FeedEntry пользователя. Если среди подписок
+    есть авторы, рецепты которых не раскладываются по лентам,
+    лента собирается при чтении из рецептов: записи ленты плюс
+    рецепты этих авторов.
+    """
+    author_ids = list(
+        User.objects.filter(
+            author_in_subscription__user=user,
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('id', flat=True)
+    )
+    if not author_ids:
+        return FeedEntry.objects.filter(user=user).select_related('recipe')
+    return Recipe.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+        | Q(author_id__in=author_ids)
+    )
+
+
+def get_feed_recipes(page):
+    """Рецепты страницы ленты из записей FeedEntry или рецептов."""
+    return [
+        item.recipe if isinstance(item, FeedEntry) else item
+        for item in page
+    ]
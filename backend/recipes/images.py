@@ -0,0 +1,114 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 6},
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def to_rgb(image):
+    """Переводит изображение в RGB, подкладывая белый фон под прозрачность."""
+    if has_alpha(image):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def encode(image, image_format):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **SAVE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+
+def normalize_image(file):
+    """Перекодирует загруженное изображение.
+
+    Поворачивает по EXIF, удаляет метаданные и уменьшает до
+    RECIPE_IMAGE_STORED_SIZE по большей стороне. Прозрачные изображения
+    сохраняются в PNG, остальные в JPEG.
+    """
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (settings.RECIPE_IMAGE_STORED_SIZE,) * 2, Image.LANCZOS
+        )
+        if has_alpha(image):
+            image_format, image = 'PNG', image.convert('RGBA')
+        else:
+            image_format, image = 'JPEG', image.convert('RGB')
+        content = encode(image, image_format)
+    name = PurePosixPath(file.name).with_suffix(
+        f'.{EXTENSIONS[image_format]}'
+    )
+    return ContentFile(content, name=name.name)
+
+
+def variant_name(name, variant, image_format):
+    path = PurePosixPath(name)
+    return str(path.with_name(
+        f'{path.stem}_{variant}.{EXTENSIONS[image_format]}'
+    ))
+
+
+def make_variants(image_file):
+    """Создает уменьшенные копии изображения рядом с оригиналом.
+
+    Возвращает словарь вариант -> имя файла в хранилище; ключ source
+    хранит имя оригинала, для которого варианты построены.
+    """
+    storage = image_file.storage
+    with storage.open(image_file.name) as file, Image.open(file) as image:
+        image = to_rgb(ImageOps.exif_transpose(image))
+    variants = {'source': image_file.name}
+    formats = ('JPEG', 'WEBP') if settings.RECIPE_IMAGE_WEBP else ('JPEG',)
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for image_format in formats:
+            key = variant if image_format == 'JPEG' else f'{variant}_webp'
+            variants[key] = storage.save(
+                variant_name(image_file.name, variant, image_format),
+                ContentFile(encode(resized, image_format)),
+            )
+    return variants
+
+
+def delete_variants(storage, variants):
+    for key, name in variants.items():
+        if key != 'source':
+            storage.delete(name)
+
+
+def process_recipe_image(recipe_id):
+    """Строит варианты изображения рецепта, заменяя устаревшие."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    storage = recipe.image.storage
+    variants = make_variants(recipe.image)
+    # Изображение могло смениться, пока строились варианты.
+    if not Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).exists():
+        delete_variants(storage, variants)
+        return
+    delete_variants(storage, recipe.image_variants)
+    recipe.image_variants = variants
+    recipe.save(update_fields=('image_variants', 'updated_at'))
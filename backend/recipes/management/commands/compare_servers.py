@@ -0,0 +1,218 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone as tz
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+from .run_benchmark import get_scenarios, percentile
+from .seed_benchmark_data import USERNAME_PREFIX
+
+INTERFACES = ('wsgi', 'asgi')
+HOT_SCENARIOS = (
+    'recipes-list-anonymous',
+    'recipes-list',
+    'recipes-list-limit-100',
+    'recipes-detail',
+    'users-subscriptions',
+    'ingredients-search',
+)
+STARTUP_TIMEOUT = 30
+
+
+class SlowClients:
+    """Клиенты, которые открывают соединение и не дописывают запрос.
+
+    Синхронный воркер gunicorn ждет такого клиента, пока не истечет
+    таймаут, а воркер uvicorn продолжает обслуживать остальных.
+    """
+
+    def __init__(self, address, count):
+        self.address = address
+        self.count = count
+        self.sockets = []
+
+    def __enter__(self):
+        for _ in range(self.count):
+            client = socket.create_connection(self.address)
+            client.sendall(b'GET /api/tags/ HTTP/1.1\r\nHost: localhost\r\n')
+            self.sockets.append(client)
+        return self
+
+    def __exit__(self, *exc_info):
+        for client in self.sockets:
+            client.close()
+        self.sockets = []
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI- и ASGI-режимы gunicorn под нагрузкой на горячих '
+        'эндпоинтах чтения: запускает локальный сервер в каждом режиме, '
+        'выполняет запросы параллельно и выводит результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=0,
+            help='Число клиентов, не дописывающих запрос.',
+        )
+        parser.add_argument('--port', type=int, default=8040)
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', help='Файл для записи JSON.')
+        parser.add_argument(
+            '--interface',
+            action='append',
+            choices=INTERFACES,
+            help='Запустить только указанные режимы.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            help='Запустить только указанные сценарии.',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').first()
+        recipe = Recipe.objects.first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных, выполните seed_benchmark_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        ingredient = Ingredient.objects.order_by('?').first()
+        scenarios = [
+            (name, path, authenticated)
+            for name, path, authenticated in get_scenarios(
+                recipe.id,
+                Tag.objects.values_list('slug', flat=True)[:2],
+                ingredient.name[:3] if ingredient else 'са',
+            )
+            if name in HOT_SCENARIOS and (
+                not options['scenario'] or name in options['scenario']
+            )
+        ]
+        # Соединение команды не должно держать базу, пока работает сервер.
+        connection.close()
+        results = {}
+        for interface in options['interface'] or INTERFACES:
+            results[interface] = self.run_server(
+                interface, scenarios, token.key, options
+            )
+        report = {
+            'label': options['label'],
+            'date': tz.now().isoformat(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'workers': options['workers'],
+            'slow_clients': options['slow_clients'],
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run_server(self, interface, scenarios, token, options):
+        address = ('127.0.0.1', options['port'])
+        config = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', config],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'SERVER_INTERFACE': interface,
+                'SERVER_BIND': '{}:{}'.format(*address),
+                'SERVER_WORKERS': str(options['workers']),
+            },
+        )
+        base_url = 'http://{}:{}'.format(*address)
+        try:
+            self.wait_for(server, base_url)
+            results = {}
+            with SlowClients(address, options['slow_clients']):
+                for name, path, authenticated in scenarios:
+                    results[name] = self.load(
+                        base_url + urllib.parse.quote(path, safe='/?=&'),
+                        {'Authorization': f'Token {token}'}
+                        if authenticated else {},
+                        options['requests'],
+                        options['concurrency'],
+                    )
+                    self.stderr.write(
+                        f'{interface} {name}: '
+                        f'{results[name]["rps"]} запр/с, '
+                        f'p50 {results[name]["p50_ms"]} мс, '
+                        f'p95 {results[name]["p95_ms"]} мс, '
+                        f'ошибок {results[name]["errors"]}'
+                    )
+            return results
+        finally:
+            server.terminate()
+            server.wait()
+
+    def wait_for(self, server, base_url):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                with urllib.request.urlopen(
+                    f'{base_url}/api/tags/', timeout=1
+                ):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Сервер не ответил за отведенное время.')
+
+    def request(self, url, headers):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(
+                urllib.request.Request(url, headers=headers), timeout=30
+            ) as response:
+                response.read()
+        except OSError:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    def load(self, url, headers, requests, concurrency):
+        self.request(url, headers)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(
+                lambda _: self.request(url, headers), range(requests)
+            ))
+        elapsed = time.perf_counter() - start
+        succeeded = [timing for timing in timings if timing is not None]
+        if not succeeded:
+            raise CommandError(f'{url}: все запросы завершились ошибкой.')
+        return {
+            'url': url,
+            'rps': round(len(succeeded) / elapsed, 1),
+            'p50_ms': round(statistics.median(succeeded), 2),
+            'p95_ms': round(percentile(succeeded, 95), 2),
+            'max_ms': round(max(succeeded), 2),
+            'errors': len(timings) - len(succeeded),
+        }
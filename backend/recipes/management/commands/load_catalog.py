@@ -0,0 +1,149 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from recipes.models import Ingredient, Recipe, Tag, assign_tag_bits
+from recipes.search import schedule_update
+from recipes.signals import catalog_changed
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color', 'slug')
+
+
+def read_rows(path, fields):
+    """Читает строки каталога из CSV или JSON в виде словарей."""
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.suffix == '.json':
+            return [
+                {field: row[field].strip() for field in fields}
+                for row in json.load(file)
+            ]
+        return [
+            dict(zip(fields, (value.strip() for value in row)))
+            for row in csv.reader(file) if row
+        ]
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты и теги из CSV или JSON пакетами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            type=Path,
+            default=DATA_DIR / 'ingredients.csv',
+            help='Файл ингредиентов (.csv или .json).',
+        )
+        parser.add_argument(
+            '--tags',
+            type=Path,
+            default=DATA_DIR / 'tags.csv',
+            help='Файл тегов (.csv или .json).',
+        )
+        parser.add_argument('--no-ingredients', action='store_true')
+        parser.add_argument('--no-tags', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        try:
+            with transaction.atomic():
+                if not options['no_ingredients']:
+                    self.report('Ингредиенты', *self.timed(
+                        self.import_ingredients, options['ingredients']
+                    ))
+                if not options['no_tags']:
+                    self.report('Теги', *self.timed(
+                        self.import_tags, options['tags']
+                    ))
+        except (OSError, KeyError, ValueError, IntegrityError,
+                ValidationError) as error:
+            raise CommandError(f'Загрузка прервана: {error}')
+
+    def timed(self, method, path):
+        self.stdout.write(f'Загрузка данных из {path}')
+        start = time.perf_counter()
+        counts = method(path)
+        return counts, time.perf_counter() - start
+
+    def report(self, title, counts, elapsed):
+        inserted, updated, skipped = counts
+        total = inserted + updated + skipped
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: добавлено {inserted}, обновлено {updated}, '
+            f'пропущено {skipped} '
+            f'({total / elapsed if elapsed else total:.0f} строк/с).'
+        ))
+
+    def import_ingredients(self, path):
+        all_rows = read_rows(path, INGREDIENT_FIELDS)
+        rows = {
+            tuple(row[field] for field in INGREDIENT_FIELDS)
+            for row in all_rows
+        }
+        existing = set(
+            Ingredient.objects.values_list(*INGREDIENT_FIELDS)
+        )
+        new_rows = sorted(rows - existing)
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in new_rows
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        if new_rows:
+            self.send_catalog_changed(Ingredient)
+        return len(new_rows), 0, len(all_rows) - len(new_rows)
+
+    def import_tags(self, path):
+        all_rows = read_rows(path, TAG_FIELDS)
+        rows = {row['slug']: row for row in all_rows}
+        existing = Tag.objects.in_bulk(rows, field_name='slug')
+        new_tags, changed_tags, renamed_tags = [], [], []
+        for slug, row in rows.items():
+            tag = existing.get(slug)
+            if tag is None:
+                new_tags.append(Tag(**row))
+            elif (tag.name, tag.color) != (row['name'], row['color']):
+                if tag.name != row['name']:
+                    renamed_tags.append(tag.pk)
+                tag.name, tag.color = row['name'], row['color']
+                changed_tags.append(tag)
+        assign_tag_bits(new_tags)
+        Tag.objects.bulk_create(
+            new_tags, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        Tag.objects.bulk_update(
+            changed_tags, ('name', 'color'), batch_size=self.batch_size
+        )
+        if renamed_tags:
+            # bulk_update не отправляет post_save, который обновляет
+            # поисковые документы рецептов с переименованным тегом.
+            schedule_update(
+                Recipe.objects.filter(
+                    tags__in=renamed_tags
+                ).values_list('id', flat=True).distinct()
+            )
+        if new_tags or changed_tags:
+            self.send_catalog_changed(Tag)
+        return (
+            len(new_tags),
+            len(changed_tags),
+            len(all_rows) - len(new_tags) - len(changed_tags),
+        )
+
+    def send_catalog_changed(self, sender):
+        """Оповещает кеши и индексы после коммита загрузки.
+
+        Иначе индекс может перестроиться по данным до коммита
+        и считать себя актуальным.
+        """
+        transaction.on_commit(lambda: catalog_changed.send(sender=sender))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='id пользователя, можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            rebuild_feeds(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны за {time.perf_counter() - start:.1f} с.'
+        ))
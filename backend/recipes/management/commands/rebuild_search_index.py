@@ -0,0 +1,18 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.search import create_index, update_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс рецептов.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        create_index(DEFAULT_DB_ALIAS)
+        update_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен за {time.perf_counter() - start:.1f} с.'
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.shopping import find_stale_shopping_lists, rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет списки покупок с корзинами и пересчитывает '
+        'разошедшиеся или все списки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить, завершиться ошибкой при расхождениях.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать все списки без проверки.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['all']:
+            with transaction.atomic():
+                rebuild_shopping_lists()
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересчитаны за '
+                f'{time.perf_counter() - start:.1f} с.'
+            ))
+            return
+        stale = find_stale_shopping_lists()
+        if options['check']:
+            if stale:
+                raise CommandError(
+                    f'Списки покупок расходятся с корзинами у {len(stale)} '
+                    f'пользователей: {", ".join(map(str, stale[:20]))}.'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок совпадают с корзинами.'
+            ))
+            return
+        if stale:
+            with transaction.atomic():
+                rebuild_shopping_lists(stale)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано списков: {len(stale)} '
+            f'за {time.perf_counter() - start:.1f} с.'
+        ))
@@ -0,0 +1,111 @@
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import (BigIntegerField, Count, OuterRef, Subquery,
+                              Sum)
+from django.db.models.functions import Cast, Coalesce, Power
+
+from recipes.models import Cart, FavoriteRecipe, Recipe
+from users.models import Subscription, User
+
+
+def count_related(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def sum_tag_masks():
+    """Подзапрос с маской тегов рецепта: сумма различных битов."""
+    return Coalesce(
+        Subquery(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                mask=Cast(
+                    Sum(Cast(Power(2, 'tag__bit'), BigIntegerField())),
+                    BigIntegerField(),
+                )
+            ).values('mask')
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (Recipe, {
+        'favorites_count': count_related(FavoriteRecipe, 'recipe'),
+        'shopping_cart_count': count_related(Cart, 'recipe'),
+        'tags_mask': sum_tag_masks(),
+    }),
+    (User, {
+        'recipes_count': count_related(Recipe, 'author'),
+        'followers_count': count_related(Subscription, 'author'),
+        'following_count': count_related(Subscription, 'user'),
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает и исправляет денормализованные счетчики '
+        'и маски тегов рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='База данных, в которой пересчитываются счетчики.',
+        )
+
+    def handle(self, *args, **options):
+        for model, counters in COUNTERS:
+            repaired = self.recount(
+                model, counters, options['chunk_size'], options['database']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: '
+                f'исправлено {repaired}.'
+            ))
+
+    def recount(self, model, counters, chunk_size, using):
+        """Проходит по таблице пачками по первичному ключу."""
+        fields = tuple(counters)
+        actual = {
+            f'actual_{field}': count for field, count in counters.items()
+        }
+        repaired = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic(using=using):
+                chunk = list(
+                    model.objects.using(using).filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .select_for_update().only('pk', *fields)
+                    .annotate(**actual)[:chunk_size]
+                )
+                if not chunk:
+                    return repaired
+                changed = []
+                for obj in chunk:
+                    values = {
+                        field: getattr(obj, f'actual_{field}')
+                        for field in fields
+                    }
+                    if any(getattr(obj, field) != value
+                           for field, value in values.items()):
+                        for field, value in values.items():
+                            setattr(obj, field, value)
+                        changed.append(obj)
+                model.objects.using(using).bulk_update(changed, fields)
+                repaired += len(changed)
+                last_pk = chunk[-1].pk
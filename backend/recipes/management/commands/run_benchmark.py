@@ -0,0 +1,166 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.utils import timezone as tz
+from rest_framework.authtoken.models import Token
+
+from core.middleware import QueryRecorder, record_queries
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+from .seed_benchmark_data import USERNAME_PREFIX
+
+
+def get_scenarios(recipe_id, tag_slugs, ingredient_prefix):
+    """Сценарии: название, путь и нужна ли авторизация.
+
+    Ответы анонимным пользователям кешируются, поэтому такие сценарии
+    замеряются дважды: с готовым ответом в кеше и с промахом
+    (суффикс -cold в отчете).
+    """
+    tags = '&'.join(f'tags={slug}' for slug in tag_slugs)
+    return (
+        ('recipes-list-anonymous', '/api/recipes/', False),
+        ('recipes-list', '/api/recipes/', True),
+        ('recipes-list-limit-100', '/api/recipes/?limit=100', True),
+        ('recipes-list-tags', f'/api/recipes/?{tags}', True),
+        ('recipes-list-favorited', '/api/recipes/?is_favorited=1', True),
+        ('recipes-list-in-cart', '/api/recipes/?is_in_shopping_cart=1', True),
+        ('recipes-detail', f'/api/recipes/{recipe_id}/', True),
+        ('users-subscriptions',
+         '/api/users/subscriptions/?recipes_limit=3', True),
+        ('ingredients-search',
+         f'/api/ingredients/?name={ingredient_prefix}', False),
+        ('recipes-download-shopping-cart',
+         '/api/recipes/download_shopping_cart/', True),
+    )
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и пиковую память '
+        'на основных эндпоинтах и выводит результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--label', default='')
+        parser.add_argument('--output', help='Файл для записи JSON.')
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            help='Запустить только указанные сценарии.',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        user = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').first()
+        recipe = Recipe.objects.first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных, выполните seed_benchmark_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {
+            False: Client(),
+            True: Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+        }
+        ingredient = Ingredient.objects.order_by('?').first()
+        scenarios = get_scenarios(
+            recipe.id,
+            Tag.objects.values_list('slug', flat=True)[:2],
+            ingredient.name[:3] if ingredient else 'са',
+        )
+        results = {}
+        for name, path, authenticated in scenarios:
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            runs = [(name, False)]
+            if not authenticated:
+                runs.append((f'{name}-cold', True))
+            for result_name, cold in runs:
+                result = results[result_name] = self.measure(
+                    clients[authenticated], path, options['iterations'],
+                    cold,
+                )
+                self.stderr.write(
+                    f'{result_name}: p50 {result["p50_ms"]} мс, '
+                    f'p95 {result["p95_ms"]} мс, {result["queries"]} SQL'
+                )
+        report = {
+            'label': options['label'],
+            'date': tz.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def request(self, client, path, cold=False):
+        """Выполняет запрос и возвращает размер ответа.
+
+        С cold к строке запроса добавляется параметр bench с текущим
+        временем, который фильтры не используют, — ответ собирается
+        заново, а индексы и поколения в кеше остаются прогретыми.
+        """
+        if cold:
+            separator = '&' if '?' in path else '?'
+            path = f'{path}{separator}bench={time.time_ns()}'
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: статус {response.status_code}')
+        if cold and response.get('X-Cache', 'MISS') != 'MISS':
+            raise CommandError(f'{path}: ответ взят из кеша')
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    def measure(self, client, path, iterations, cold=False):
+        self.request(client, path)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            size = self.request(client, path, cold)
+            timings.append((time.perf_counter() - start) * 1000)
+        recorder = QueryRecorder(keep_sql=False)
+        with record_queries(recorder):
+            self.request(client, path, cold)
+        tracemalloc.start()
+        try:
+            self.request(client, path, cold)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'path': path,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': size,
+        }
@@ -0,0 +1,167 @@
+import random
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from PIL import Image
+
+from recipes.feed import rebuild_feeds
+from recipes.models import (Cart, FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredientAmount, Tag)
+from recipes.search import schedule_update
+from recipes.shopping import rebuild_shopping_lists
+from recipes.signals import catalog_changed
+from users.models import Subscription, User
+
+USERNAME_PREFIX = 'bench_'
+IMAGE_NAME = 'recipes/images/benchmark.jpg'
+
+
+def get_image():
+    """Общая картинка для всех синтетических рецептов."""
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), 'orange').save(buffer, 'JPEG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетические данные для замеров производительности.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes-per-user', type=int, default=10)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее созданные синтетические данные.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).delete()
+            self.stdout.write(f'Удалено объектов: {deleted}.')
+        if not Ingredient.objects.exists():
+            call_command('load_catalog', stdout=self.stdout)
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not tag_ids:
+            raise CommandError('Нет тегов, выполните load_catalog.')
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                user_ids, options['recipes_per_user']
+            )
+            self.link_recipes(
+                recipe_ids,
+                ingredient_ids,
+                tag_ids,
+                options['ingredients_per_recipe'],
+                options['tags_per_recipe'],
+            )
+            schedule_update(recipe_ids)
+            for model, per_user in (
+                (FavoriteRecipe, options['favorites_per_user']),
+                (Cart, options['carts_per_user']),
+            ):
+                self.bulk_create(model, (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in self.sample(recipe_ids, per_user)
+                ))
+            self.bulk_create(Subscription, (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in self.sample(
+                    user_ids, options['subscriptions_per_user'] + 1
+                )
+                if author_id != user_id
+            ))
+        call_command('recount_counters', stdout=self.stdout)
+        rebuild_feeds(user_ids)
+        rebuild_shopping_lists(user_ids)
+        catalog_changed.send(sender=Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)} '
+            f'за {time.perf_counter() - start:.1f} с.'
+        ))
+
+    def sample(self, population, size):
+        return self.random.sample(population, min(size, len(population)))
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+
+    def create_users(self, count):
+        offset = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        users = []
+        for number in range(offset, offset + count):
+            user = User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+                first_name=f'Имя {number}',
+                last_name=f'Фамилия {number}',
+            )
+            user.set_unusable_password()
+            users.append(user)
+        self.bulk_create(User, users)
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, user_ids, per_user):
+        image = get_image()
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=user_id,
+                name=f'Рецепт {user_id}-{number}',
+                image=image,
+                text='Синтетический рецепт для замеров.',
+                cooking_time=self.random.randint(5, 180),
+            )
+            for user_id in user_ids
+            for number in range(per_user)
+        ))
+        return list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).values_list('id', flat=True))
+
+    def link_recipes(self, recipe_ids, ingredient_ids, tag_ids,
+                     ingredients_per_recipe, tags_per_recipe):
+        self.bulk_create(RecipeIngredientAmount, (
+            RecipeIngredientAmount(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.sample(
+                ingredient_ids, ingredients_per_recipe
+            )
+        ))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.sample(tag_ids, tags_per_recipe)
+        ))
@@ -1,6 +1,8 @@
 from colorfield.fields import ColorField
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -26,12 +28,51 @@ class Tag(models.Model):
         max_length=settings.MAX_NAME_SLUG_MEASUREMENT_UNIT_LENGHT,
         unique=True,
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тегов рецепта',
+        unique=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    def clean(self):
+        if self.bit is None and not get_free_tag_bits():
+            raise ValidationError(
+                f'Нельзя создать больше {settings.MAX_TAGS} тегов!'
+            )
+
+
+def get_free_tag_bits(using=None):
+    used = set(
+        Tag.objects.using(using).exclude(bit=None).values_list(
+            'bit', flat=True
+        )
+    )
+    return [bit for bit in range(settings.MAX_TAGS) if bit not in used]
+
+
+def assign_tag_bits(tags, using=None):
+    """Выдает новым тегам свободные биты маски Recipe.tags_mask."""
+    tags = [tag for tag in tags if tag.bit is None]
+    if not tags:
+        return
+    free_bits = get_free_tag_bits(using)
+    if len(free_bits) < len(tags):
+        raise ValidationError(
+            f'Нельзя создать больше {settings.MAX_TAGS} тегов!'
+        )
+    for tag, bit in zip(tags, free_bits):
+        tag.bit = bit
+
 
 class Ingredient(models.Model):
     """Модель для ингредиента."""
@@ -77,6 +118,11 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes/images/',
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -105,11 +151,42 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Маска тегов',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый документ',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date', 'name',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_popularity_idx',
+            ),
+        )
 
 
 class RecipeIngredientAmount(models.Model):
@@ -192,9 +269,106 @@ class Cart(AbstractUsersRecipe):
         verbose_name='Дата добавления в корзину',
         auto_now=True,
     )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name='Число порций',
+        default=settings.MIN_SERVINGS,
+        validators=(
+            MinValueValidator(
+                settings.MIN_SERVINGS
+            ),
+            MaxValueValidator(
+                settings.MAX_SERVINGS
+            )
+        )
+    )
 
     class Meta(AbstractUsersRecipe.Meta):
         default_related_name = 'shopping_cart'
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
         ordering = ('-id',)
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в корзине пользователя.
+
+    Учитывает число порций каждого рецепта в корзине. Обновляется
+    при добавлении и удалении рецептов из корзины, изменении числа
+    порций и ингредиентов рецептов, которые в ней лежат.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    class Meta:
+        ordering = ('user', 'ingredient',)
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'ingredient', ],
+                name='unique_shopping_list_item',
+            ),
+        )
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Автор и дата публикации скопированы из рецепта, чтобы лента
+    читалась и чистилась по индексам без соединения с рецептами.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='feed',
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'recipe', ],
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_date_idx',
+            ),
+            models.Index(
+                fields=['author', 'user'],
+                name='feed_author_user_idx',
+            ),
+        )
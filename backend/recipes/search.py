@@ -0,0 +1,175 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, Recipe, RecipeIngredientAmount, Tag
+
+SEARCH_TABLE = 'recipes_recipe_search'
+SEARCH_INDEX = 'recipes_recipe_search_vector_idx'
+SEARCH_BATCH_SIZE = 500
+# Веса названия, тегов, ингредиентов и описания для bm25 в SQLite.
+FTS_WEIGHTS = '10.0, 5.0, 5.0, 1.0'
+
+RECIPE = Recipe._meta.db_table
+NAMES = (
+    'coalesce((SELECT {aggregate}(item.name, \' \') FROM {link} AS link '
+    'JOIN {table} AS item ON item.id = link.{column} '
+    'WHERE link.recipe_id = {recipe}.id), \'\')'
+)
+# Документ приводится к тому же виду, что и запрос в fold: «ё» как «е».
+# Регистр приводят сами to_tsvector и токенизатор FTS5.
+FOLD_SQL = "replace(replace({}, 'Ё', 'Е'), 'ё', 'е')"
+POSTGRES_VECTOR = (
+    'setweight(to_tsvector(%(config)s::regconfig, {document}), \'{weight}\')'
+)
+
+
+def fold(value):
+    """Приводит строку к виду для поиска без учета регистра и «ё»."""
+    return value.strip().casefold().replace('ё', 'е')
+
+
+def names_sql(aggregate):
+    """Подзапросы названий тегов и ингредиентов рецепта одной строкой."""
+    return [
+        FOLD_SQL.format(NAMES.format(
+            aggregate=aggregate,
+            link=link._meta.db_table,
+            table=model._meta.db_table,
+            column=column,
+            recipe=RECIPE,
+        ))
+        for link, model, column in (
+            (Recipe.tags.through, Tag, 'tag_id'),
+            (RecipeIngredientAmount, Ingredient, 'ingredient_id'),
+        )
+    ]
+
+
+def postgres_update_sql(where):
+    tags, ingredients = names_sql('string_agg')
+    vector = ' || '.join(
+        POSTGRES_VECTOR.format(document=document, weight=weight)
+        for document, weight in (
+            (FOLD_SQL.format(f'{RECIPE}.name'), 'A'),
+            (tags, 'B'),
+            (ingredients, 'B'),
+            (FOLD_SQL.format(f'{RECIPE}.text'), 'C'),
+        )
+    )
+    return f'UPDATE {RECIPE} SET search_vector = {vector} {where}'
+
+
+def sqlite_insert_sql(where):
+    tags, ingredients = names_sql('group_concat')
+    return (
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, tags, ingredients, text) '
+        f'SELECT id, {FOLD_SQL.format("name")}, {tags}, {ingredients}, '
+        f'{FOLD_SQL.format("text")} FROM {RECIPE} {where}'
+    )
+
+
+def create_index(using):
+    """Создает GIN-индекс в PostgreSQL или таблицу FTS5 в SQLite."""
+    db = connections[using]
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} '
+                f'ON {RECIPE} USING gin (search_vector)'
+            )
+        elif db.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+                'USING fts5(name, tags, ingredients, text)'
+            )
+
+
+def update_index(recipe_ids=None):
+    """Пересчитывает поисковые документы рецептов.
+
+    Без recipe_ids перестраивается весь индекс. Документы удаленных
+    рецептов из таблицы FTS5 тоже удаляются.
+    """
+    if recipe_ids is None:
+        batches = [None]
+    else:
+        recipe_ids = sorted(set(recipe_ids))
+        batches = [
+            recipe_ids[start:start + SEARCH_BATCH_SIZE]
+            for start in range(0, len(recipe_ids), SEARCH_BATCH_SIZE)
+        ]
+    with connection.cursor() as cursor:
+        for ids in batches:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    postgres_update_sql(
+                        '' if ids is None
+                        else f'WHERE {RECIPE}.id = ANY(%(ids)s)'
+                    ),
+                    {'config': settings.SEARCH_CONFIG, 'ids': ids},
+                )
+            elif connection.vendor == 'sqlite':
+                delete_where = where = ''
+                params = ()
+                if ids is not None:
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    delete_where = f'WHERE rowid IN ({placeholders})'
+                    where = f'WHERE id IN ({placeholders})'
+                    params = ids
+                cursor.execute(
+                    f'DELETE FROM {SEARCH_TABLE} {delete_where}', params
+                )
+                cursor.execute(sqlite_insert_sql(where), params)
+
+
+def schedule_update(recipe_ids):
+    """Обновляет поисковые документы после коммита транзакции.
+
+    К этому моменту рецепт, его теги и ингредиенты уже сохранены,
+    поэтому порядок записей внутри транзакции не важен.
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_index(recipe_ids))
+
+
+def fts_query(value):
+    """Запрос FTS5: все слова из value как префиксы."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', value))
+
+
+def search_recipes(queryset, value):
+    """Рецепты, найденные по value, в порядке релевантности.
+
+    Ищет по названию, тегам, ингредиентам и описанию без учета регистра
+    и различия «е» и «ё». Для других баз используется поиск подстроки
+    в названии и описании.
+    """
+    value = fold(value)
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+    if connection.vendor == 'sqlite':
+        query = fts_query(value)
+        if not query:
+            return queryset.none()
+        return queryset.annotate(
+            rank=RawSQL(
+                f'SELECT -bm25({SEARCH_TABLE}, {FTS_WEIGHTS}) '
+                f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'AND rowid = {RECIPE}.id',
+                (query,),
+            )
+        ).filter(rank__isnull=False).order_by('-rank', '-pub_date', '-id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    )
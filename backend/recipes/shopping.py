@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Cart, RecipeIngredientAmount, ShoppingListItem, User
+
+
+def create_items(user_ids, ingredient_ids):
+    """Заводит нулевые строки списков, которых еще нет."""
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id in ingredient_ids
+        ),
+        batch_size=settings.SHOPPING_LIST_CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def apply_deltas(items, deltas, servings=Value(1)):
+    """Прибавляет к строкам items изменения {ingredient_id: delta}.
+
+    Изменения умножаются на servings — число или выражение с числом
+    порций. Все изменения применяются одним UPDATE, количество
+    не уходит ниже нуля, опустевшие строки удаляются.
+    """
+    items.filter(ingredient_id__in=deltas).update(amount=Greatest(
+        F('amount') + Case(
+            *[
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ],
+            default=Value(0),
+        ) * servings,
+        Value(0),
+    ))
+    if any(delta < 0 for delta in deltas.values()):
+        items.filter(amount=0).delete()
+
+
+def cart_changed(user_id, recipe_id, servings):
+    """Добавляет (servings > 0) или вычитает (servings < 0) порции рецепта."""
+    amounts = dict(
+        RecipeIngredientAmount.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+    if not amounts:
+        return
+    if servings > 0:
+        create_items([user_id], amounts)
+    apply_deltas(
+        ShoppingListItem.objects.filter(user_id=user_id),
+        {
+            ingredient_id: servings * amount
+            for ingredient_id, amount in amounts.items()
+        },
+    )
+
+
+def set_servings(user_id, recipe_id, servings):
+    """Меняет число порций рецепта в корзине вместе со списком покупок.
+
+    Возвращает False, если рецепта нет в корзине.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(
+            user_id=user_id, recipe_id=recipe_id
+        ).first()
+        if cart is None:
+            return False
+        if servings != cart.servings:
+            cart_changed(user_id, recipe_id, servings - cart.servings)
+            Cart.objects.filter(pk=cart.pk).update(servings=servings)
+    return True
+
+
+def recipe_amounts_changed(recipe_id, deltas):
+    """Переносит изменения ингредиентов рецепта в списки покупок.
+
+    Затрагиваются все пользователи, у которых рецепт в корзине,
+    изменения умножаются на число порций в корзине каждого из них.
+    Число запросов от количества пользователей не зависит.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    carts = Cart.objects.filter(recipe_id=recipe_id)
+    added = [ingredient_id for ingredient_id, delta in deltas.items()
+             if delta > 0]
+    if added:
+        user_ids = list(carts.values_list('user_id', flat=True))
+        if not user_ids:
+            return
+        create_items(user_ids, added)
+    apply_deltas(
+        ShoppingListItem.objects.filter(user_id__in=carts.values('user_id')),
+        deltas,
+        Subquery(
+            carts.filter(user_id=OuterRef('user_id')).values('servings')[:1]
+        ),
+    )
+
+
+def get_cart_totals(user_ids):
+    """Суммы ингредиентов в корзинах пользователей с учетом порций."""
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in Cart.objects.filter(
+            user_id__in=user_ids,
+            recipe__recipeingredientamount__isnull=False,
+        ).values(
+            'user_id',
+            'recipe__recipeingredientamount__ingredient_id',
+        ).annotate(
+            amount=Sum(
+                F('recipe__recipeingredientamount__amount') * F('servings')
+            ),
+        ).order_by().values_list(
+            'user_id',
+            'recipe__recipeingredientamount__ingredient_id',
+            'amount',
+        )
+    }
+
+
+def get_items(user_ids):
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+        ).values_list('user_id', 'ingredient_id', 'amount')
+    }
+
+
+def iter_user_batches(user_ids=None):
+    """id пользователей пачками по SHOPPING_LIST_CHUNK_SIZE."""
+    users = User.objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    last_id = 0
+    while batch := list(
+        users.filter(pk__gt=last_id).values_list(
+            'pk', flat=True
+        )[:settings.SHOPPING_LIST_CHUNK_SIZE]
+    ):
+        yield batch
+        last_id = batch[-1]
+
+
+def find_stale_shopping_lists(user_ids=None):
+    """id пользователей, чьи списки покупок разошлись с корзинами."""
+    stale = []
+    for batch in iter_user_batches(user_ids):
+        expected = get_cart_totals(batch)
+        actual = get_items(batch)
+        stale.extend(sorted({
+            user_id
+            for user_id, ingredient_id in expected.keys() | actual.keys()
+            if expected.get((user_id, ingredient_id))
+            != actual.get((user_id, ingredient_id))
+        }))
+    return stale
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересчитывает списки покупок из корзин пачками пользователей."""
+    for batch in iter_user_batches(user_ids):
+        ShoppingListItem.objects.filter(user_id__in=batch).delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=amount
+                )
+                for (user_id, ingredient_id), amount
+                in get_cart_totals(batch).items()
+            ),
+            batch_size=settings.SHOPPING_LIST_CHUNK_SIZE,
+        )
@@ -0,0 +1,253 @@
+from collections import Counter
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import Signal, receiver
+
+from core.counters import change_counter
+from core.tasks import run_in_background
+
+from users.models import Subscription
+
+from .feed import (backfill_author_feeds, backfill_feed, fan_out_recipes,
+                   trim_feed)
+from .images import delete_variants, process_recipe_image
+from .models import (Cart, FavoriteRecipe, Ingredient, Recipe,
+                     RecipeIngredientAmount, Tag, User, assign_tag_bits)
+from .search import create_index, schedule_update
+from .shopping import cart_changed, rebuild_shopping_lists
+
+# Отправляется после массовых изменений, при которых post_save
+# и post_delete не вызываются (bulk_create, bulk_update, update).
+catalog_changed = Signal()
+# Отправляется с recipes — рецептами, созданными вместе с тегами
+# и ингредиентами. post_save нового рецепта отправляет его же, поэтому
+# импорт через bulk_create получает те же счетчики, ленты, поиск
+# и копии картинок.
+recipes_created = Signal()
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    Cart: 'shopping_cart_count',
+}
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=Cart)
+def users_recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=Cart)
+def users_recipe_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Cart)
+def shopping_list_added(sender, instance, created, **kwargs):
+    if created:
+        cart_changed(instance.user_id, instance.recipe_id, instance.servings)
+
+
+@receiver(pre_delete, sender=Cart)
+def shopping_list_removed(sender, instance, **kwargs):
+    cart_changed(
+        instance.user_id, instance.recipe_id, -instance.servings
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        recipes_created.send(sender=sender, recipes=[instance])
+
+
+@receiver(recipes_created)
+def recipes_counted(sender, recipes, **kwargs):
+    authors = Counter(recipe.author_id for recipe in recipes)
+    for author_id, count in authors.items():
+        change_counter(User, author_id, 'recipes_count', count)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(recipes_created)
+def recipes_feed_created(sender, recipes, **kwargs):
+    run_in_background(fan_out_recipes, [recipe.pk for recipe in recipes])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_feed_created(sender, instance, created, **kwargs):
+    if created:
+        run_in_background(backfill_feed, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_feed_deleted(sender, instance, **kwargs):
+    trim_feed(instance.user_id, instance.author_id)
+    run_in_background(backfill_author_feeds, instance.author_id)
+
+
+def schedule_image(recipe):
+    if (recipe.image
+            and recipe.image_variants.get('source') != recipe.image.name):
+        run_in_background(process_recipe_image, recipe.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, created, **kwargs):
+    if not created:
+        schedule_image(instance)
+
+
+@receiver(recipes_created)
+def recipes_image_created(sender, recipes, **kwargs):
+    for recipe in recipes:
+        schedule_image(recipe)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    delete_variants(instance.image.storage, instance.image_variants)
+
+
+@receiver(post_migrate)
+def search_index_migrated(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        create_index(using)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_saved(sender, instance, created, update_fields=None,
+                        **kwargs):
+    if not created and (
+        update_fields is None or {'name', 'text'} & set(update_fields)
+    ):
+        schedule_update([instance.pk])
+
+
+@receiver(recipes_created)
+def recipes_search_created(sender, recipes, **kwargs):
+    schedule_update(recipe.pk for recipe in recipes)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(sender, instance, **kwargs):
+    schedule_update([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredientAmount)
+@receiver(post_delete, sender=RecipeIngredientAmount)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    schedule_update([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            schedule_update([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        schedule_update(pk_set)
+    elif action == 'pre_clear':
+        schedule_update(
+            instance.recipe_tags.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_search_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        schedule_update(
+            Recipe.objects.filter(tags=instance).values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        schedule_update(
+            RecipeIngredientAmount.objects.filter(
+                ingredient=instance
+            ).values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(pre_save, sender=Tag)
+def tag_bit_assigned(sender, instance, **kwargs):
+    assign_tag_bits([instance])
+
+
+@receiver(post_migrate)
+def tag_bits_migrated(sender, using, **kwargs):
+    """Выдает биты тегам, созданным до появления маски, и считает маски."""
+    if sender.name != 'recipes':
+        return
+    tags = list(Tag.objects.using(using).filter(bit=None))
+    if tags:
+        assign_tag_bits(tags, using)
+        Tag.objects.using(using).bulk_update(tags, ('bit',))
+        call_command('recount_counters', database=using)
+
+
+@receiver(post_migrate)
+def shopping_lists_migrated(sender, using, **kwargs):
+    """Собирает списки покупок корзин, наполненных до их появления."""
+    if sender.name != 'recipes':
+        return
+    user_ids = list(
+        User.objects.using(using).filter(
+            shopping_cart__isnull=False, shopping_list__isnull=True
+        ).values_list('pk', flat=True).distinct()
+    )
+    if user_ids:
+        with transaction.atomic(using=using):
+            rebuild_shopping_lists(user_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_mask_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action == 'pre_clear' and reverse:
+        Recipe.objects.filter(tags=instance).update(
+            tags_mask=F('tags_mask').bitand(~instance.mask)
+        )
+    elif action == 'post_clear' and not reverse:
+        Recipe.objects.filter(pk=instance.pk).update(tags_mask=0)
+        instance.tags_mask = 0
+    elif action in ('post_add', 'post_remove') and pk_set:
+        if reverse:
+            recipe_ids, mask = pk_set, instance.mask
+        else:
+            recipe_ids = [instance.pk]
+            mask = sum(
+                1 << bit for bit in Tag.objects.filter(
+                    pk__in=pk_set
+                ).values_list('bit', flat=True)
+            )
+        if action == 'post_add':
+            tags_mask = F('tags_mask').bitor(mask)
+        else:
+            tags_mask = F('tags_mask').bitand(~mask)
+        Recipe.objects.filter(pk__in=recipe_ids).update(tags_mask=tags_mask)
+        if not reverse:
+            instance.tags_mask = (
+                instance.tags_mask | mask if action == 'post_add'
+                else instance.tags_mask & ~mask
+            )
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_mask_deleted(sender, instance, **kwargs):
+    Recipe.objects.filter(tags=instance).update(
+        tags_mask=F('tags_mask').bitand(~instance.mask)
+    )
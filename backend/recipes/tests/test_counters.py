@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class CountersTest(TestCase):
+    """Денормализованные счетчики совпадают с данными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = [
+            User.objects.create(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=username,
+                last_name=username,
+            )
+            for username in ('author', 'reader', 'other')
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assert_counters(self, favorites, carts):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(
+            (recipe.favorites_count, recipe.shopping_cart_count),
+            (favorites, carts),
+        )
+        self.assertEqual(
+            (recipe.favorites.count(), recipe.shopping_cart.count()),
+            (favorites, carts),
+        )
+
+    def test_favorites_and_cart(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        reader = self.client_for(self.reader)
+        other = self.client_for(self.other)
+        for client in (reader, other):
+            self.assertEqual(client.post(f'{url}favorite/').status_code, 201)
+        self.assertEqual(reader.post(f'{url}shopping_cart/').status_code, 201)
+        # Повторное добавление отклоняется и счетчик не меняет.
+        self.assertEqual(reader.post(f'{url}favorite/').status_code, 400)
+        self.assert_counters(2, 1)
+        self.assertEqual(reader.delete(f'{url}favorite/').status_code, 204)
+        self.assertEqual(
+            reader.delete(f'{url}shopping_cart/').status_code, 204
+        )
+        self.assertEqual(reader.delete(f'{url}favorite/').status_code, 400)
+        self.assert_counters(1, 0)
+
+    def test_deleting_user(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        reader = self.client_for(self.reader)
+        reader.post(f'{url}favorite/')
+        reader.post(f'{url}shopping_cart/')
+        Subscription.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        self.assert_counters(0, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_deleting_recipe(self):
+        Subscription.objects.create(user=self.author, author=self.reader)
+        self.client_for(self.reader).post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.recipes_count, self.author.following_count), (0, 1)
+        )
+        self.reader.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.following_count, 0)
+
+    def test_recount_repairs_tampered_counters(self):
+        Subscription.objects.create(user=self.reader, author=self.author)
+        self.client_for(self.reader).post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        Recipe.objects.update(favorites_count=99, shopping_cart_count=7)
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=0, followers_count=5
+        )
+        stdout = StringIO()
+        call_command('recount_counters', stdout=stdout)
+        self.assertIn('исправлено 1', stdout.getvalue())
+        self.assert_counters(1, 0)
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.recipes_count, self.author.followers_count), (1, 1)
+        )
@@ -0,0 +1,97 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+class FeedTest(TestCase):
+    """Лента подписок при раскладке рецептов и подмешивании при чтении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = [
+            User.objects.create(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=username,
+                last_name=username,
+            )
+            for username in ('author', 'reader', 'other')
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.create(user=user, author=self.author)
+
+    def unsubscribe(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(
+                user=user, author=self.author
+            ).get().delete()
+
+    def publish(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author,
+                name=name,
+                text='Рецепт.',
+                cooking_time=10,
+            )
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def get_entries(self, user):
+        return list(
+            FeedEntry.objects.filter(user=user).values_list(
+                'recipe__name', flat=True
+            )
+        )
+
+    def test_fan_out(self):
+        old = self.publish('Старый')
+        self.subscribe(self.reader)
+        self.assertEqual(self.get_entries(self.reader), [old.name])
+        self.publish('Новый')
+        self.assertEqual(self.get_entries(self.reader), ['Новый', 'Старый'])
+        self.assertEqual(self.get_feed(), ['Новый', 'Старый'])
+
+    def test_unsubscribe_trims_feed(self):
+        self.subscribe(self.reader)
+        self.subscribe(self.other)
+        self.publish('Суп')
+        self.unsubscribe(self.reader)
+        self.assertEqual(self.get_entries(self.reader), [])
+        self.assertEqual(self.get_entries(self.other), ['Суп'])
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_big_author_merged_on_read(self):
+        self.subscribe(self.reader)
+        self.subscribe(self.other)
+        self.publish('Суп')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.get_feed(), ['Суп'])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_crossing_threshold(self):
+        self.publish('Каша')
+        self.subscribe(self.reader)
+        self.assertEqual(self.get_entries(self.reader), ['Каша'])
+        # Автор стал большим: записи убираются, рецепты подмешиваются.
+        self.subscribe(self.other)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.publish('Суп')
+        self.assertEqual(self.get_feed(), ['Суп', 'Каша'])
+        # Снова небольшой: ленты оставшихся подписчиков дополняются
+        # и рецептами, опубликованными, пока он был большим.
+        self.unsubscribe(self.other)
+        self.assertEqual(self.get_entries(self.reader), ['Суп', 'Каша'])
+        self.assertEqual(self.get_feed(), ['Суп', 'Каша'])
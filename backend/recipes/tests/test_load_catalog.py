@@ -0,0 +1,58 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient, Tag
+from recipes.signals import catalog_changed
+
+
+class LoadCatalogTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.ingredients = Path(directory.name) / 'ingredients.csv'
+        self.ingredients.write_text(
+            'сахар,г\nсоль,г\nсахар,г\n', encoding='utf-8'
+        )
+        self.tags = Path(directory.name) / 'tags.csv'
+        self.tags.write_text(
+            'Завтрак,#FFFF00,breakfast\nЗавтрак,#FFFF00,breakfast\n',
+            encoding='utf-8',
+        )
+        self.senders = []
+
+        def receiver(sender, **kwargs):
+            self.senders.append(sender)
+
+        catalog_changed.connect(receiver)
+        self.addCleanup(catalog_changed.disconnect, receiver)
+
+    def load(self):
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'load_catalog',
+                ingredients=self.ingredients,
+                tags=self.tags,
+                stdout=stdout,
+            )
+            self.assertEqual(self.senders, [])
+        return stdout.getvalue()
+
+    def test_duplicates_are_skipped(self):
+        output = self.load()
+        self.assertIn('Ингредиенты: добавлено 2, обновлено 0, пропущено 1',
+                      output)
+        self.assertIn('Теги: добавлено 1, обновлено 0, пропущено 1', output)
+        self.assertEqual(self.senders, [Ingredient, Tag])
+        self.senders.clear()
+        output = self.load()
+        self.assertIn('Ингредиенты: добавлено 0, обновлено 0, пропущено 3',
+                      output)
+        self.assertEqual(self.senders, [])
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(Tag.objects.count(), 1)
@@ -0,0 +1,87 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredientAmount, Tag
+from recipes.search import update_index
+from users.models import User
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск по названию, тегам и ингредиентам без учета «ё»."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        # Рецепты без сигналов: картинки не обрабатываются, а индекс
+        # строится целиком ниже.
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=name,
+                text=text,
+                cooking_time=10,
+                image='recipes/images/soup.jpg',
+            )
+            for name, text in (
+                ('Мёд с орехами', 'Десерт.'),
+                ('Чай', 'Подавать с медом и лимоном.'),
+                ('Оладьи', 'Жарить на сковороде.'),
+            )
+        ])
+        cls.recipes = {recipe.name: recipe for recipe in Recipe.objects.all()}
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#FFFF00', slug='breakfast'
+        )
+        cls.recipes['Оладьи'].tags.add(cls.tag)
+        RecipeIngredientAmount.objects.create(
+            recipe=cls.recipes['Оладьи'],
+            ingredient=Ingredient.objects.create(
+                name='Свёкла', measurement_unit='г'
+            ),
+            amount=100,
+        )
+        update_index()
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, value):
+        response = APIClient().get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_name_and_text_are_ranked(self):
+        for value in ('мед', 'МЁД', 'Мед'):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(value), ['Мёд с орехами', 'Чай'])
+
+    def test_tags_and_ingredients_match(self):
+        self.assertEqual(self.search('завтрак'), ['Оладьи'])
+        self.assertEqual(self.search('свекла'), ['Оладьи'])
+        self.assertEqual(self.search('свёкла завтрак'), ['Оладьи'])
+        self.assertEqual(self.search('ужин'), [])
+
+    def test_catalog_tag_rename_is_indexed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tags = Path(directory) / 'tags.csv'
+            tags.write_text('Бранч,#FFFF00,breakfast\n', encoding='utf-8')
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    'load_catalog',
+                    tags=tags,
+                    no_ingredients=True,
+                    stdout=StringIO(),
+                )
+        self.assertEqual(self.search('бранч'), ['Оладьи'])
+        self.assertEqual(self.search('завтрак'), [])
@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.test import TestCase
+
+from recipes.models import (Cart, Ingredient, Recipe, RecipeIngredientAmount,
+                            ShoppingListItem)
+from recipes.signals import shopping_lists_migrated
+from users.models import User
+
+
+class ShoppingListsMigratedTest(TestCase):
+    """После migrate списки покупок собираются для уже наполненных
+    корзин."""
+
+    def test_existing_carts_are_rebuilt(self):
+        user = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        recipe = Recipe.objects.create(
+            author=user,
+            name='Суп',
+            text='Рецепт супа.',
+            cooking_time=10,
+            image='recipes/images/soup.jpg',
+        )
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        RecipeIngredientAmount.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=5
+        )
+        # Корзина из развертывания, где списков покупок еще не было.
+        Cart.objects.bulk_create([Cart(user=user, recipe=recipe)])
+        self.assertFalse(ShoppingListItem.objects.exists())
+        shopping_lists_migrated(
+            sender=apps.get_app_config('recipes'), using='default'
+        )
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount'
+            )),
+            [(user.pk, ingredient.pk, 5)],
+        )
@@ -0,0 +1,93 @@
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from recipes.signals import tag_bits_migrated
+from users.models import User
+
+
+class TagsMaskTest(TestCase):
+    """Теги и связи, созданные до появления маски, получают биты
+    после migrate, и фильтр по тегам работает по маске."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author',
+            email='author@example.com',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        # Без сигналов, как данные из развертывания до появления маски.
+        Tag.objects.bulk_create([
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#FFFF00', 'breakfast'),
+                ('Обед', '#FF0000', 'lunch'),
+            )
+        ])
+        cls.breakfast = Tag.objects.get(slug='breakfast')
+        cls.lunch = Tag.objects.get(slug='lunch')
+        Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=name,
+                text='Рецепт.',
+                cooking_time=10,
+                image='recipes/images/soup.jpg',
+            )
+            for name in ('Каша', 'Суп', 'Омлет')
+        ])
+        recipes = {recipe.name: recipe for recipe in Recipe.objects.all()}
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipes[name], tag=tag)
+            for name, tag in (
+                ('Каша', cls.breakfast),
+                ('Суп', cls.lunch),
+                ('Омлет', cls.breakfast),
+                ('Омлет', cls.lunch),
+            )
+        ])
+
+    def get_names(self, query):
+        response = APIClient().get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(
+            recipe['name'] for recipe in response.json()['results']
+        )
+
+    def test_migrate_assigns_bits_and_masks(self):
+        self.assertFalse(Tag.objects.exclude(bit=None).exists())
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            tag_bits_migrated(
+                sender=apps.get_app_config('recipes'), using='default'
+            )
+        self.breakfast.refresh_from_db()
+        self.lunch.refresh_from_db()
+        self.assertNotEqual(self.breakfast.bit, self.lunch.bit)
+        self.assertEqual(
+            Recipe.objects.get(name='Омлет').tags_mask,
+            self.breakfast.mask | self.lunch.mask,
+        )
+        self.assertEqual(
+            self.get_names('tags=breakfast&tags=lunch'),
+            ['Каша', 'Омлет', 'Суп'],
+        )
+        self.assertEqual(
+            self.get_names('tags=breakfast&tags=lunch&tags_mode=all'),
+            ['Омлет'],
+        )
+        self.assertEqual(self.get_names('tags=lunch'), ['Омлет', 'Суп'])
+
+    def test_recount_uses_migrated_database(self):
+        with mock.patch('recipes.signals.call_command') as call_command:
+            tag_bits_migrated(
+                sender=apps.get_app_config('recipes'), using='default'
+            )
+        call_command.assert_called_once_with(
+            'recount_counters', database='default'
+        )
@@ -0,0 +1,45 @@
+from django.db.models import BigIntegerField, Case, F, Value, When
+from django.db.models.functions import Cast
+
+# Единицы измерения, которые сводятся к базовой: масса — к граммам,
+# объем — к миллилитрам, штучные — к штукам. Множители целые, поэтому
+# суммы остаются целыми. Остальные единицы (по вкусу, пучок, ...)
+# складываются как есть.
+UNIT_GROUPS = {
+    'г': {'г': 1, 'кг': 1000},
+    'мл': {'мл': 1, 'л': 1000, 'стакан': 250, 'ст. л.': 15, 'ч. л.': 5},
+    'шт.': {'шт.': 1, 'шт': 1, 'десяток': 10},
+}
+UNITS = {
+    unit: (base_unit, factor)
+    for base_unit, units in UNIT_GROUPS.items()
+    for unit, factor in units.items()
+}
+
+
+def base_unit(unit_field):
+    """Выражение: базовая единица для единицы из поля unit_field."""
+    return Case(
+        *[
+            When(**{f'{unit_field}__in': list(units)}, then=Value(base))
+            for base, units in UNIT_GROUPS.items()
+        ],
+        default=F(unit_field),
+    )
+
+
+def to_base_unit(amount_field, unit_field):
+    """Выражение: количество amount_field в базовой единице.
+
+    Умножение выполняется в bigint: в integer количество в килограммах
+    или литрах, переведенное в граммы, переполняется.
+    """
+    return Cast(F(amount_field), BigIntegerField()) * Case(
+        *[
+            When(**{unit_field: unit}, then=Value(factor))
+            for unit, (_, factor) in UNITS.items()
+            if factor != 1
+        ],
+        default=Value(1),
+        output_field=BigIntegerField(),
+    )
@@ -22,11 +22,11 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.display(description='Количество подписок')
     def count_following(self, obj):
-        return obj.author_in_subscription.count()
+        return obj.followers_count
 
     @admin.display(description='Количество рецептов в избранном')
     def count_recipe(self, obj):
-        return obj.recipe_author.count()
+        return obj.recipes_count
 
 
 @admin.register(Subscription)
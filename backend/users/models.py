@@ -33,6 +33,21 @@ class User(AbstractUser):
         max_length=settings.MAX_USER_LENGHT,
 
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.counters import change_counter
+
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+        change_counter(User, instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+    change_counter(User, instance.user_id, 'following_count', -1)